@@ -9,7 +9,11 @@ import os
 import logging
 from datetime import datetime, time
 from modules.connection import connection_manager
+from modules.connection.serial_transport import set_event_loop
 from modules.core import pattern_manager
+from modules.core.motion_executor import motion_executor
+from modules.core.telemetry import telemetry_poller, clamp_rate
+from modules.connection.connection_supervisor import connection_supervisor
 from modules.core.pattern_manager import parse_theta_rho_file, THETA_RHO_DIR
 from modules.core import playlist_manager
 from modules.update import update_manager
@@ -49,11 +53,18 @@ async def lifespan(app: FastAPI):
     # Register signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    # Worker threads, e.g. the connection supervisor's, schedule coroutines on this loop
+    set_event_loop(asyncio.get_running_loop())
     
     try:
-        connection_manager.connect_device()
+        # Probing ports and waiting for the controller to boot block, keep them off the loop
+        await asyncio.to_thread(connection_manager.connect_device)
     except Exception as e:
         logger.warning(f"Failed to auto-connect to serial port: {str(e)}")
+
+    # Polls whichever connection is current, so it can start before one exists
+    telemetry_poller.start()
+    connection_supervisor.start()
         
     try:
         mqtt_handler = mqtt.init_mqtt()
@@ -81,6 +92,7 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Pydantic models for request/response validation
 class ConnectRequest(BaseModel):
     port: Optional[str] = None
+    stream_mode: Optional[str] = None
 
 class CoordinateRequest(BaseModel):
     theta: float
@@ -93,6 +105,7 @@ class PlaylistRequest(BaseModel):
     clear_pattern: Optional[str] = None
     run_mode: str = "single"
     shuffle: bool = False
+    optimize_order: bool = False
 
 class PlaylistRunRequest(BaseModel):
     playlist_name: str
@@ -100,12 +113,44 @@ class PlaylistRunRequest(BaseModel):
     clear_pattern: Optional[str] = None
     run_mode: Optional[str] = "single"
     shuffle: Optional[bool] = False
+    optimize_order: Optional[bool] = False
     start_time: Optional[str] = None
     end_time: Optional[str] = None
 
 class SpeedRequest(BaseModel):
     speed: float
 
+class SimplifyToleranceRequest(BaseModel):
+    tolerance: float
+
+class ArcFittingRequest(BaseModel):
+    enabled: bool
+    table_type: Optional[str] = None
+
+class EstimateDurationRequest(BaseModel):
+    file_name: Optional[str] = None
+    playlist_name: Optional[str] = None
+    # Playlist run options the estimate follows
+    pause_time: Optional[float] = 0
+    clear_pattern: Optional[str] = None
+    optimize_order: Optional[bool] = False
+
+class DynamicFeedRequest(BaseModel):
+    enabled: bool
+
+class TelemetryRateRequest(BaseModel):
+    rate: float
+
+class StartRotationRequest(BaseModel):
+    enabled: bool
+
+class AutoReverseRequest(BaseModel):
+    enabled: bool
+
+class RotationSafeRequest(BaseModel):
+    file_name: str
+    rotation_safe: bool
+
 class WLEDRequest(BaseModel):
     wled_ip: Optional[str] = None
 
@@ -192,6 +237,36 @@ async def websocket_cache_progress_endpoint(websocket: WebSocket):
         except RuntimeError:
             pass
 
+@app.websocket("/ws/telemetry")
+async def websocket_telemetry_endpoint(websocket: WebSocket, rate: float = 5):
+    """Stream live position samples, down-sampled to the rate (Hz) the client asks for."""
+    await websocket.accept()
+    last_sample = None
+    try:
+        while True:
+            # Never faster than the controller is polled
+            client_rate = clamp_rate(min(rate, state.telemetry_rate or rate))
+            sample = telemetry_poller.latest()
+            if sample is not None and sample is not last_sample:
+                last_sample = sample
+                try:
+                    await websocket.send_json({
+                        "type": "telemetry",
+                        "data": sample
+                    })
+                except RuntimeError as e:
+                    if "close message has been sent" in str(e):
+                        break
+                    raise
+            await asyncio.sleep(1 / client_rate if client_rate else 1)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        try:
+            await websocket.close()
+        except RuntimeError:
+            pass
+
 # FastAPI routes
 @app.get("/")
 async def index(request: Request):
@@ -208,15 +283,21 @@ async def list_ports():
 
 @app.post("/connect")
 async def connect(request: ConnectRequest):
+    if request.stream_mode and request.stream_mode not in connection_manager.STREAM_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid stream mode: {request.stream_mode}")
+    if request.stream_mode:
+        state.stream_mode = request.stream_mode
+        state.save()
+
     if not request.port:
-        state.conn = connection_manager.WebSocketConnection('ws://fluidnc.local:81')
-        connection_manager.device_init()
+        state.conn = await asyncio.to_thread(connection_manager.WebSocketConnection, 'ws://fluidnc.local:81', stream_mode=request.stream_mode)
+        await asyncio.to_thread(connection_manager.device_init)
         logger.info('Successfully connected to websocket ws://fluidnc.local:81')
         return {"success": True}
 
     try:
-        state.conn = connection_manager.SerialConnection(request.port)
-        connection_manager.device_init()
+        state.conn = await asyncio.to_thread(connection_manager.SerialConnection, request.port, stream_mode=request.stream_mode)
+        await asyncio.to_thread(connection_manager.device_init)
         logger.info(f'Successfully connected to serial port {request.port}')
         return {"success": True}
     except Exception as e:
@@ -226,7 +307,7 @@ async def connect(request: ConnectRequest):
 @app.post("/disconnect")
 async def disconnect():
     try:
-        state.conn.close()
+        await asyncio.to_thread(state.conn.close)
         logger.info('Successfully disconnected from serial port')
         return {"success": True}
     except Exception as e:
@@ -241,7 +322,7 @@ async def restart(request: ConnectRequest):
 
     try:
         logger.info(f"Restarting connection on port {request.port}")
-        connection_manager.restart_connection()
+        await asyncio.to_thread(connection_manager.restart_connection)
         return {"success": True}
     except Exception as e:
         logger.error(f"Failed to restart serial on port {request.port}: {str(e)}")
@@ -311,7 +392,7 @@ async def get_theta_rho_coordinates(request: GetCoordinatesRequest):
             raise HTTPException(status_code=404, detail=f"File {file_name} not found")
         
         # Parse the theta-rho file
-        coordinates = parse_theta_rho_file(file_path)
+        coordinates = await asyncio.to_thread(parse_theta_rho_file, file_path)
         
         if not coordinates:
             raise HTTPException(status_code=400, detail="No valid coordinates found in file")
@@ -382,13 +463,31 @@ async def stop_execution():
     pattern_manager.stop_actions()
     return {"success": True}
 
+@app.post("/resume")
+async def resume_interrupted_pattern(background_tasks: BackgroundTasks):
+    """Re-home and continue the pattern that was interrupted by a crash or a lost connection."""
+    if not (state.conn.is_connected() if state.conn else False):
+        logger.warning("Attempted to resume a pattern without a connection")
+        raise HTTPException(status_code=400, detail="Connection not established")
+
+    if pattern_manager.pattern_lock.locked():
+        logger.warning("Attempted to resume a pattern while another is already running")
+        raise HTTPException(status_code=409, detail="Another pattern is already running")
+
+    checkpoint = pattern_manager.get_resume_checkpoint()
+    if not checkpoint:
+        raise HTTPException(status_code=404, detail="No interrupted pattern to resume")
+
+    background_tasks.add_task(pattern_manager.resume_interrupted_pattern)
+    return {"success": True, "file": checkpoint["file"], "index": checkpoint["index"], "points": checkpoint["points"]}
+
 @app.post("/send_home")
 async def send_home():
     try:
         if not (state.conn.is_connected() if state.conn else False):
             logger.warning("Attempted to move to home without a connection")
             raise HTTPException(status_code=400, detail="Connection not established")
-        connection_manager.home()
+        await motion_executor.run(connection_manager.home)
         return {"success": True}
     except Exception as e:
         logger.error(f"Failed to send home command: {str(e)}")
@@ -437,8 +536,8 @@ async def move_to_center():
             raise HTTPException(status_code=400, detail="Connection not established")
 
         logger.info("Moving device to center position")
-        pattern_manager.reset_theta()
-        pattern_manager.move_polar(0, 0)
+        await motion_executor.run(pattern_manager.reset_theta)
+        await motion_executor.run(pattern_manager.move_polar, 0, 0)
         return {"success": True}
     except Exception as e:
         logger.error(f"Failed to move to center: {str(e)}")
@@ -450,8 +549,8 @@ async def move_to_perimeter():
         if not (state.conn.is_connected() if state.conn else False):
             logger.warning("Attempted to move to perimeter without a connection")
             raise HTTPException(status_code=400, detail="Connection not established")
-        pattern_manager.reset_theta()
-        pattern_manager.move_polar(0, 1)
+        await motion_executor.run(pattern_manager.reset_theta)
+        await motion_executor.run(pattern_manager.move_polar, 0, 1)
         return {"success": True}
     except Exception as e:
         logger.error(f"Failed to move to perimeter: {str(e)}")
@@ -543,7 +642,7 @@ async def send_coordinate(request: CoordinateRequest):
 
     try:
         logger.debug(f"Sending coordinate: theta={request.theta}, rho={request.rho}")
-        pattern_manager.move_polar(request.theta, request.rho)
+        await motion_executor.run(pattern_manager.move_polar, request.theta, request.rho)
         return {"success": True}
     except Exception as e:
         logger.error(f"Failed to send coordinate: {str(e)}")
@@ -563,9 +662,16 @@ async def serial_status():
     logger.debug(f"Serial status check - connected: {connected}, port: {port}")
     return {
         "connected": connected,
-        "port": port
+        "port": port,
+        "stream_mode": state.conn.stream_mode if state.conn else state.stream_mode,
+        "probe": list(connection_manager.probe_results.values())
     }
 
+@app.get("/connection_health")
+async def connection_health():
+    """Link failure, reconnect and resume counters of the connection supervisor."""
+    return connection_supervisor.health()
+
 @app.post("/pause_execution")
 async def pause_execution():
     if pattern_manager.pause_execution():
@@ -653,7 +759,8 @@ async def run_playlist_endpoint(request: PlaylistRequest):
             pause_time=request.pause_time,
             clear_pattern=request.clear_pattern,
             run_mode=request.run_mode,
-            shuffle=request.shuffle
+            shuffle=request.shuffle,
+            optimize_order=request.optimize_order
         )
         if not success:
             raise HTTPException(status_code=409, detail=message)
@@ -674,12 +781,116 @@ async def set_speed(request: SpeedRequest):
             logger.warning(f"Invalid speed value received: {request.speed}")
             raise HTTPException(status_code=400, detail="Invalid speed value")
         
-        state.speed = request.speed
+        pattern_manager.set_speed(request.speed)
         return {"success": True, "speed": request.speed}
     except Exception as e:
         logger.error(f"Failed to set speed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/set_simplify_tolerance")
+async def set_simplify_tolerance(request: SimplifyToleranceRequest):
+    if request.tolerance < 0:
+        logger.warning(f"Invalid simplification tolerance received: {request.tolerance}")
+        raise HTTPException(status_code=400, detail="Tolerance must not be negative")
+    state.simplify_tolerance = request.tolerance
+    state.save()
+    logger.info(f"Path simplification tolerance set to {request.tolerance}mm")
+    return {"success": True, "tolerance": state.simplify_tolerance}
+
+@app.post("/set_arc_fitting")
+async def set_arc_fitting(request: ArcFittingRequest):
+    table_type = request.table_type or state.table_type
+    if not table_type:
+        logger.warning("Arc fitting change requested without a known table type")
+        raise HTTPException(status_code=400, detail="No table type provided or detected")
+    state.arc_fitting[table_type] = request.enabled
+    state.save()
+    logger.info(f"Arc fitting {'enabled' if request.enabled else 'disabled'} for {table_type}")
+    return {"success": True, "arc_fitting": state.arc_fitting}
+
+@app.post("/estimate_duration")
+async def estimate_duration(request: EstimateDurationRequest):
+    """
+    Estimate how long a pattern, or one pass of a playlist run with the given
+    options, takes at the current speed. Nothing is compiled to the cache.
+    """
+    if request.playlist_name:
+        playlist = playlist_manager.get_playlist(request.playlist_name)
+        if not playlist:
+            raise HTTPException(status_code=404, detail=f"Playlist '{request.playlist_name}' not found")
+        file_names = playlist["files"]
+    elif request.file_name:
+        file_names = [request.file_name]
+    else:
+        raise HTTPException(status_code=400, detail="Provide a file_name or playlist_name")
+
+    file_paths = []
+    for file_name in file_names:
+        file_path = os.path.join(THETA_RHO_DIR, file_name)
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=404, detail=f"File not found: {file_name}")
+        file_paths.append(file_path)
+
+    if not request.playlist_name:
+        duration = await asyncio.to_thread(pattern_manager.estimate_pattern_duration, file_paths[0], False)
+        return {"success": True, "total_seconds": duration or 0.0, "files": {request.file_name: duration}}
+
+    if request.optimize_order:
+        file_paths = await asyncio.to_thread(pattern_manager.optimize_playlist_order, file_paths)
+    estimate = await asyncio.to_thread(pattern_manager.estimate_playlist_duration, file_paths,
+                                       request.pause_time or 0, request.clear_pattern)
+    return {
+        "success": True,
+        "total_seconds": estimate["total"],
+        "files": {os.path.relpath(path, THETA_RHO_DIR): seconds for path, seconds in estimate["patterns"].items()},
+        "clearing_seconds": estimate["clearing"],
+        "pause_seconds": estimate["pausing"],
+    }
+
+@app.post("/set_dynamic_feed")
+async def set_dynamic_feed(request: DynamicFeedRequest):
+    state.dynamic_feed = request.enabled
+    state.save()
+    logger.info(f"Dynamic feed rate {'enabled' if request.enabled else 'disabled'}")
+    return {"success": True, "dynamic_feed": state.dynamic_feed}
+
+@app.post("/set_start_rotation")
+async def set_start_rotation(request: StartRotationRequest):
+    state.start_rotation = request.enabled
+    state.save()
+    logger.info(f"Start rotation {'enabled' if request.enabled else 'disabled'}")
+    return {"success": True, "start_rotation": state.start_rotation}
+
+@app.post("/set_auto_reverse")
+async def set_auto_reverse(request: AutoReverseRequest):
+    state.auto_reverse = request.enabled
+    state.save()
+    logger.info(f"Automatic reverse playback {'enabled' if request.enabled else 'disabled'}")
+    return {"success": True, "auto_reverse": state.auto_reverse}
+
+@app.post("/set_rotation_safe")
+async def set_pattern_rotation_safe(request: RotationSafeRequest):
+    """Mark whether a pattern may be rotated to start at the ball's current angle."""
+    file_path = os.path.join(THETA_RHO_DIR, request.file_name)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail=f"File not found: {request.file_name}")
+    pattern_manager.set_rotation_safe(file_path, request.rotation_safe)
+    return {"success": True, "file_name": request.file_name, "rotation_safe": request.rotation_safe}
+
+@app.post("/set_telemetry_rate")
+async def set_telemetry_rate(request: TelemetryRateRequest):
+    if request.rate < 0:
+        raise HTTPException(status_code=400, detail="Rate must not be negative")
+    state.telemetry_rate = clamp_rate(request.rate)
+    state.save()
+    logger.info(f"Telemetry rate set to {state.telemetry_rate} Hz")
+    return {"success": True, "rate": state.telemetry_rate}
+
+@app.get("/telemetry")
+async def get_telemetry(seconds: Optional[float] = None):
+    """Return the buffered position samples, optionally only the last few seconds."""
+    return {"rate": state.telemetry_rate, "samples": telemetry_poller.history(seconds)}
+
 @app.get("/check_software_update")
 async def check_updates():
     update_info = update_manager.check_git_updates()
@@ -722,7 +933,7 @@ async def get_wled_ip():
 async def skip_pattern():
     if not state.current_playlist:
         raise HTTPException(status_code=400, detail="No playlist is currently running")
-    state.skip_requested = True
+    pattern_manager.skip_pattern()
     return {"success": True}
 
 @app.post("/preview_thr_batch")
@@ -1,25 +1,253 @@
+import asyncio
+import hashlib
 import threading
 import time
 import logging
+from collections import deque
 import serial
 import serial.tools.list_ports
 import websocket
 
 from modules.core.state import state
+from modules.core.ack_ledger import ack_ledger
+from modules.core.motion_executor import motion_executor
+from modules.core.kinematics import compute_polar_coordinates_from_state
+from modules.connection.gcode_encoder import GCodeEncoder
+from modules.connection.serial_transport import SerialLineTransport
+from modules.connection.response_router import ResponseRouter, RESPONSE_EVENT
 from modules.led.led_controller import effect_loading, effect_idle, effect_connected, LEDController
 logger = logging.getLogger(__name__)
 
 IGNORE_PORTS = ['/dev/cu.debug-console', '/dev/cu.Bluetooth-Incoming-Port']
 
+# G-code streaming modes
+STREAM_MODE_SEND_WAIT = 'send_wait'
+STREAM_MODE_CHARACTER_COUNTING = 'character_counting'
+STREAM_MODES = (STREAM_MODE_SEND_WAIT, STREAM_MODE_CHARACTER_COUNTING)
+
+# GRBL's serial RX buffer is 128 bytes with one reserved; FluidNC's is larger,
+# so this is a safe amount of unacknowledged data for both firmwares.
+DEFAULT_RX_BUFFER_SIZE = 127
+
+# Real-time commands are acted on as soon as they arrive, ahead of any
+# buffered G-code, and take no RX buffer space or ack
+RT_FEED_HOLD = '!'
+RT_CYCLE_START = '~'
+RT_SOFT_RESET = '\x18'
+# Feed override real-time commands and the range of levels they step through
+RT_FEED_OVR_RESET = '\x90'
+RT_FEED_OVR_COARSE_PLUS = '\x91'
+RT_FEED_OVR_COARSE_MINUS = '\x92'
+RT_FEED_OVR_FINE_PLUS = '\x93'
+RT_FEED_OVR_FINE_MINUS = '\x94'
+FEED_OVERRIDE_MIN = 10
+FEED_OVERRIDE_MAX = 200
+FEED_OVERRIDE_COARSE_STEP = 10
+# A stop request must reach the controller within this many seconds
+STOP_LATENCY_TARGET_S = 0.1
+# Status polling interval while waiting for a feed hold to complete
+HOLD_POLL_INTERVAL_S = 0.02
+
+# An ESP32 resets when its port is opened and takes up to this long to boot
+BOOT_DELAY_S = 2.0
+# Longest a port probe waits for a controller to answer its handshake, a
+# controller that resets on open gets the whole boot time and some more
+PROBE_TIMEOUT_S = BOOT_DELAY_S + 0.5
+# A controller that announced itself with a banner gets this long to answer the handshake sent after it
+PROBE_BANNER_ANSWER_S = 1.0
+# Probe score from which a port is taken to have a controller on it
+CONTROLLER_SCORE = 3
+# Longest wait for the '$$' settings dump to be acknowledged
+SETTINGS_TIMEOUT_S = 3
+# Settings sets kept, one per port and firmware build
+SETTINGS_CACHE_SIZE = 8
+# Status query interval while waiting for the planner to drain at the end of motion
+IDLE_POLL_INTERVAL_S = 0.05
+
+###############################################################################
+# G-code Streaming
+###############################################################################
+
+class CharacterCountingStreamer:
+    """
+    Stream G-code using GRBL's character-counting flow control.
+
+    Every line sent is remembered until the controller acknowledges it with
+    'ok' or 'error'. A new line is only written once it fits in the part of the
+    RX buffer the controller has not consumed yet, so the planner always has
+    moves queued instead of waiting on a round trip per line. Acks are handed
+    in by the connection's ResponseRouter, which owns all reads. Lines tagged
+    with a pattern point index report their ack to the ack ledger, and the
+    first of them the controller rejects is kept in `rejected`.
+
+    While halted, see halt(), nothing is sent: a move queued before the stop
+    would otherwise reach the controller after its reset.
+    """
+    def __init__(self, conn, rx_buffer_size: int = DEFAULT_RX_BUFFER_SIZE):
+        self.conn = conn
+        self.rx_buffer_size = rx_buffer_size
+        self.cond = threading.Condition()
+        self.in_flight = deque()
+        self.bytes_in_flight = 0
+        # When the oldest in-flight line was sent or the last ack arrived
+        self.last_progress = time.monotonic()
+        # Set once the link failed, nothing more is sent
+        self.failed = False
+        # Tag of the first tagged line answered with an error, see take_rejected
+        self.rejected = None
+        # Halts in progress, nothing is sent until each was followed by reopen()
+        self.halts = 0
+
+    def send_line(self, line: str, tag: int = None, force: bool = False) -> bool:
+        """
+        Send a single line once there is room for it in the RX buffer.
+        Returns False if a stop was requested while waiting for room, the
+        streamer is halted or the link failed. With force, a line is sent
+        while halted, for the halt's own commands.
+        """
+        data = line + "\n"
+        with self.cond:
+            while self.in_flight and self.bytes_in_flight + len(data) > self.rx_buffer_size:
+                if state.stop_requested or self.failed or (self.halts and not force):
+                    return False
+                self.cond.wait(0.1)
+            # The room may have been made by the reset of a halt
+            if self.failed or (self.halts and not force):
+                return False
+            if not self.in_flight:
+                self.last_progress = time.monotonic()
+            # Record the line before writing it so its ack can't arrive first
+            self.in_flight.append((line, tag))
+            self.bytes_in_flight += len(data)
+            if self.conn.router:
+                self.conn.router.mark_busy()
+            try:
+                self.conn.send(data)
+            except Exception:
+                self.in_flight.pop()
+                self.bytes_in_flight -= len(data)
+                raise
+        self.conn.bytes_sent += len(data)
+        logger.debug(f"Streamed command: {line} ({self.bytes_in_flight} bytes in flight)")
+        return True
+
+    def handle_response(self, response: str) -> bool:
+        """
+        Release the oldest in-flight line if the response acknowledges it.
+        Returns True if the response was an acknowledgement.
+        """
+        lowered = response.lower()
+        if lowered != "ok" and not lowered.startswith("error"):
+            logger.debug(f"Response: {response}")
+            return False
+        with self.cond:
+            if not self.in_flight:
+                return True
+            line, tag = self.in_flight.popleft()
+            self.bytes_in_flight -= len(line) + 1
+            self.last_progress = time.monotonic()
+            self.cond.notify_all()
+        if tag is not None:
+            ack_ledger.record_ack(tag)
+        if lowered.startswith("error"):
+            logger.warning(f"Controller rejected '{line}': {response}")
+            if tag is not None:
+                with self.cond:
+                    if self.rejected is None:
+                        self.rejected = tag
+        return True
+
+    def take_rejected(self):
+        """Return the tag of the first rejected tagged line since the last call, or None."""
+        with self.cond:
+            rejected, self.rejected = self.rejected, None
+        return rejected
+
+    def wait_until_drained(self, timeout: float = None) -> bool:
+        """Block until every streamed line has been acknowledged."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: not self.in_flight, timeout):
+                logger.warning(f"{len(self.in_flight)} streamed commands still unacknowledged after {timeout}s")
+                return False
+        return True
+
+    def reset(self) -> None:
+        """Forget every in-flight line, e.g. after the controller was reset."""
+        with self.cond:
+            self.in_flight.clear()
+            self.bytes_in_flight = 0
+            self.rejected = None
+            self.cond.notify_all()
+
+    def halt(self) -> None:
+        """Stop sending until reopen(), waking every waiter."""
+        with self.cond:
+            self.halts += 1
+            self.cond.notify_all()
+
+    def reopen(self) -> None:
+        """Send again once every halt was followed by a reopen()."""
+        with self.cond:
+            self.halts = max(self.halts - 1, 0)
+
+    def abort(self) -> None:
+        """Give up on the in-flight lines after the link failed, waking every waiter."""
+        with self.cond:
+            self.failed = True
+            self.in_flight.clear()
+            self.bytes_in_flight = 0
+            self.cond.notify_all()
+
+    def ack_age(self) -> float:
+        """Seconds the oldest in-flight line has waited for its ack, 0 if none is waiting."""
+        with self.cond:
+            if not self.in_flight:
+                return 0.0
+            return time.monotonic() - self.last_progress
+
 ###############################################################################
 # Connection Abstraction
 ###############################################################################
 
 class BaseConnection:
     """Abstract base class for a connection."""
+    stream_mode = STREAM_MODE_SEND_WAIT
+    streamer = None
+    encoder = None
+    router = None
+    # Bytes of G-code sent through send_command, for bandwidth statistics
+    bytes_sent = 0
+    # Feed override (%) last set on the controller
+    feed_override = 100
+    # Set by close(), a closed connection is not a failed one
+    closed = False
+    # Set while halt() resets the controller, whose banner is then expected
+    reset_pending = False
+
+    def configure_streaming(self, stream_mode: str = None, rx_buffer_size: int = DEFAULT_RX_BUFFER_SIZE) -> None:
+        """Select how G-code is streamed over this connection."""
+        stream_mode = stream_mode or state.stream_mode
+        if stream_mode not in STREAM_MODES:
+            logger.warning(f"Unknown stream mode '{stream_mode}', falling back to {STREAM_MODE_SEND_WAIT}")
+            stream_mode = STREAM_MODE_SEND_WAIT
+        self.stream_mode = stream_mode
+        self.streamer = CharacterCountingStreamer(self, rx_buffer_size)
+        # A fresh connection makes no assumptions about the controller's modal state
+        self.encoder = GCodeEncoder(state.x_steps_per_mm, state.y_steps_per_mm)
+        if self.router:
+            self.router.stop()
+        # From here on the router is the only reader of this connection
+        self.router = ResponseRouter(self)
+        self.router.start()
+        logger.info(f"G-code stream mode: {stream_mode}")
+
     def send(self, data: str) -> None:
         raise NotImplementedError 
 
+    def send_realtime(self, command: str) -> None:
+        """Send real-time command bytes, which include values above 0x7F."""
+        self.send(command)
+
     def flush(self) -> None:
         raise NotImplementedError
 
@@ -35,43 +263,72 @@ class BaseConnection:
     def close(self) -> None:
         raise NotImplementedError
 
+    async def send_async(self, data: str) -> None:
+        """Send without blocking the event loop."""
+        await asyncio.to_thread(self.send, data)
+
 ###############################################################################
 # Serial Connection Implementation
 ###############################################################################
 
 class SerialConnection(BaseConnection):
-    def __init__(self, port: str, baudrate: int = 115200, timeout: int = 2):
+    """
+    Serial connection read through a SerialLineTransport. Its ResponseRouter
+    makes the blocking reads on its own thread, so streaming does not depend on
+    the event loop.
+    """
+    def __init__(self, port: str, baudrate: int = 115200, timeout: int = 2, stream_mode: str = None, ser=None):
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
         self.lock = threading.RLock()
         logger.info(f'Connecting to Serial port {port}')
-        self.ser = serial.Serial(port, baudrate, timeout=timeout)
+        if ser is not None:
+            # Already opened by the port probe, reopening could reset the controller
+            ser.timeout = timeout
+            ser.reset_input_buffer()
+            self.ser = ser
+        else:
+            self.ser = serial.Serial(port, baudrate, timeout=timeout)
+            # Opening the port resets an ESP32, which drops anything sent while it boots
+            banner = wait_for_boot(self.ser)
+            if banner:
+                logger.info(f"Controller booted: {banner}")
+            else:
+                logger.info(f"No startup banner within {BOOT_DELAY_S}s, controller did not reset")
+        self.transport = SerialLineTransport(self.ser)
         state.port = port
         logger.info(f'Connected to Serial port {port}')
+        self.configure_streaming(stream_mode)
 
     def send(self, data: str) -> None:
-        with self.lock:
-            self.ser.write(data.encode())
-            self.ser.flush()
+        self.transport.write_blocking(data.encode())
+
+    def send_realtime(self, command: str) -> None:
+        # One byte per command, UTF-8 would split the extended ones in two
+        self.transport.write_blocking(command.encode('latin-1'))
 
     def flush(self) -> None:
         with self.lock:
             self.ser.flush()
 
     def readline(self) -> str:
-        with self.lock:
-            return self.ser.readline().decode().strip()
+        return self.transport.readline_blocking()
 
     def in_waiting(self) -> int:
-        with self.lock:
-            return self.ser.in_waiting
+        return self.transport.pending()
 
     def is_connected(self) -> bool:
-        return self.ser is not None and self.ser.is_open
+        return self.ser is not None and self.ser.is_open and not self.transport.closed
 
     def close(self) -> None:
+        self.closed = True
         update_machine_position()
+        self.router.stop()
+        self.transport.close()
+        if hasattr(self.ser, "cancel_read"):
+            # Wake the router from a read that would otherwise wait for its timeout
+            self.ser.cancel_read()
         with self.lock:
             if self.ser.is_open:
                 self.ser.close()
@@ -83,12 +340,13 @@ class SerialConnection(BaseConnection):
 ###############################################################################
 
 class WebSocketConnection(BaseConnection):
-    def __init__(self, url: str, timeout: int = 5):
+    def __init__(self, url: str, timeout: int = 5, stream_mode: str = None):
         self.url = url
         self.timeout = timeout
         self.lock = threading.RLock()
         self.ws = None
         self.connect()
+        self.configure_streaming(stream_mode)
 
     def connect(self):
         logger.info(f'Connecting to Websocket {self.url}')
@@ -100,17 +358,22 @@ class WebSocketConnection(BaseConnection):
         with self.lock:
             self.ws.send(data)
 
+    def send_realtime(self, command: str) -> None:
+        # A text frame would UTF-8 encode the extended commands
+        with self.lock:
+            self.ws.send_binary(command.encode('latin-1'))
+
     def flush(self) -> None:
         # WebSocket sends immediately; nothing to flush.
         pass
 
     def readline(self) -> str:
-        with self.lock:
-            data = self.ws.recv()
-            # Decode bytes to string if necessary
-            if isinstance(data, bytes):
-                data = data.decode('utf-8')
-            return data.strip()
+        # Only the response router reads, so don't hold up senders while waiting
+        data = self.ws.recv()
+        # Decode bytes to string if necessary
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return data.strip()
 
     def in_waiting(self) -> int:
         return 0  # Not applicable for WebSocket
@@ -119,7 +382,9 @@ class WebSocketConnection(BaseConnection):
         return self.ws is not None
 
     def close(self) -> None:
+        self.closed = True
         update_machine_position()
+        self.router.stop()
         with self.lock:
             if self.ws:
                 self.ws.close()
@@ -133,9 +398,142 @@ def list_serial_ports():
     logger.debug(f"Available serial ports: {available_ports}")
     return available_ports
 
+# Latest probe result of every port, see find_controller_port
+probe_results = {}
+
+def score_probe_line(line: str, result: dict) -> int:
+    """Score one line received in answer to the probe handshake."""
+    if line.startswith("[VER:"):
+        result["firmware"] = line[5:].rstrip("]").rstrip(":")
+        return 3
+    if line.startswith("Grbl"):
+        # Startup banner, e.g. "Grbl 3.7 [FluidNC v3.7.8 '$' for help]"
+        result["firmware"] = result["firmware"] or line
+        return 2
+    if line.startswith("<") and line.endswith(">"):
+        return 2
+    if line == "ok" or line.startswith("error"):
+        return 1
+    return 0
+
+def probe_port(port: str, timeout=PROBE_TIMEOUT_S, baudrate: int = 115200):
+    """
+    Check whether a GRBL/FluidNC controller is on `port` with a short
+    handshake: a build info request ($I) and a status query. Controllers that
+    reset when the port opens announce themselves with a banner once booted
+    and get the handshake again, with PROBE_BANNER_ANSWER_S to answer it even
+    if the banner came late.
+
+    Returns:
+        Tuple of (result dict with port, score, firmware, elapsed and error,
+        the open serial.Serial or None if it could not be opened).
+    """
+    start = time.time()
+    result = {"port": port, "score": 0, "firmware": None, "elapsed": None, "error": None}
+    try:
+        ser = serial.Serial(port, baudrate, timeout=0.05)
+    except Exception as e:
+        result["error"] = str(e)
+        return result, None
+    try:
+        handshake = b"\n$I\n?"
+        ser.write(handshake)
+        resent = False
+        partial = b""
+        deadline = start + timeout
+        while time.time() < deadline and result["score"] < CONTROLLER_SCORE:
+            partial += ser.read(ser.in_waiting or 1)
+            *lines, partial = partial.split(b"\n")
+            for raw in lines:
+                line = raw.decode("utf-8", errors="replace").strip()
+                result["score"] += score_probe_line(line, result)
+                if line.startswith("Grbl"):
+                    # A banner means the controller just booted and missed the handshake
+                    ser.write(handshake)
+                    resent = True
+                    deadline = max(deadline, time.time() + PROBE_BANNER_ANSWER_S)
+            if not resent and not result["score"] and time.time() - start > timeout / 2:
+                ser.write(handshake)
+                resent = True
+    except Exception as e:
+        result["error"] = str(e)
+    result["elapsed"] = time.time() - start
+    return result, ser
+
+def wait_for_boot(ser, timeout=BOOT_DELAY_S):
+    """
+    Wait for the startup banner of a controller that reset when its port was
+    opened. Returns the banner, or None if none came within `timeout`.
+    """
+    read_timeout = ser.timeout
+    ser.timeout = 0.1
+    deadline = time.time() + timeout
+    try:
+        while time.time() < deadline:
+            line = ser.readline().decode("utf-8", errors="replace").strip()
+            if line.startswith("Grbl"):
+                return line
+    finally:
+        ser.timeout = read_timeout
+    return None
+
+def find_controller_port(ports, timeout=PROBE_TIMEOUT_S):
+    """
+    Probe all ports at once and return (port, open serial.Serial) of the first
+    controller to answer, or (None, None). If none reaches CONTROLLER_SCORE,
+    the port that answered best is returned instead of being closed, since
+    reopening it could reset the controller again. Probes still running then
+    finish in the background, recording their scores in probe_results and
+    closing their ports.
+    """
+    probe_results.clear()
+    if not ports:
+        return None, None
+    lock = threading.Lock()
+    found = threading.Event()
+    claim = {"port": None, "ser": None, "pending": len(ports), "best": None}
+
+    def probe(port):
+        result, ser = probe_port(port, timeout)
+        with lock:
+            probe_results[port] = result
+            if ser is not None and claim["port"] is None:
+                best = claim["best"]
+                if result["score"] >= CONTROLLER_SCORE:
+                    claim["port"], claim["ser"] = port, ser
+                    ser = best[2] if best else None
+                    claim["best"] = None
+                elif result["score"] and (best is None or result["score"] > best[0]):
+                    claim["best"] = (result["score"], port, ser)
+                    ser = best[2] if best else None
+            claim["pending"] -= 1
+            if claim["port"] is not None or not claim["pending"]:
+                found.set()
+        if ser is not None:
+            ser.close()
+
+    for port in ports:
+        threading.Thread(target=probe, args=(port,), name=f"probe-{port}", daemon=True).start()
+    found.wait(timeout + PROBE_BANNER_ANSWER_S + 1)
+    with lock:
+        port, ser = claim["port"], claim["ser"]
+        if port is None and claim["best"]:
+            _, port, ser = claim["best"]
+            claim["best"] = None
+            logger.warning(f"No controller answered the whole probe, using {port}, which answered in part")
+        # Too late for probes still running, they close their ports
+        claim["port"] = port or False
+        scores = ", ".join(f"{p}: {r['score']} in {r['elapsed'] * 1000:.0f}ms" if r["elapsed"] is not None
+                           else f"{p}: {r['error']}" for p, r in probe_results.items())
+    logger.info(f"Port probe scores: {scores or 'none yet'}")
+    if port:
+        firmware = probe_results[port]["firmware"]
+        logger.info(f"Controller found on {port}" + (f" ({firmware})" if firmware else ""))
+    return port or None, ser
+
 def device_init(homing=True):
     try:
-        if get_machine_steps():
+        if load_machine_settings():
             logger.info(f"x_steps_per_mm: {state.x_steps_per_mm}, y_steps_per_mm: {state.y_steps_per_mm}, gear_ratio: {state.gear_ratio}")
     except:
         logger.fatal("Not GRBL firmware")
@@ -153,8 +551,6 @@ def device_init(homing=True):
         logger.info(f'x, y; {machine_x}, {machine_y}')
         logger.info(f'State x, y; {state.machine_x}, {state.machine_y}')
 
-    time.sleep(2)  # Allow time for the connection to establish
-
 
 def connect_device(homing=True):
     if state.wled_ip:
@@ -163,36 +559,51 @@ def connect_device(homing=True):
         
     ports = list_serial_ports()
 
-    if state.port and state.port in ports:
-        state.conn = SerialConnection(state.port)
-    elif ports:
-        state.conn = SerialConnection(ports[0])
-    else:
+    if not ports:
         logger.warning("No serial ports found. Falling back to WebSocket.")
         # state.conn = WebSocketConnection('ws://fluidnc.local:81')
         return
+    port, ser = find_controller_port(ports)
+    if port:
+        state.conn = SerialConnection(port, ser=ser)
+    elif state.port in ports:
+        logger.warning(f"No controller answered the probe, trying the last used port {state.port}")
+        state.conn = SerialConnection(state.port)
+    else:
+        logger.warning("No controller answered on any serial port")
+        return
     if (state.conn.is_connected() if state.conn else False):
         device_init(homing)
         
     if state.led_controller:
         effect_connected(state.led_controller)
 
-def get_status_response() -> str:
+def request_status(timeout=2):
+    """
+    Send a status query ('?') and wait for the report the response router
+    receives after it. Returns None if none arrived in time.
+    """
+    router = state.conn.router
+    after = router.status_count
+    state.conn.send('?')
+    return router.wait_for_status(timeout, after=after)
+
+def get_status_response(timeout=5) -> str:
     """
     Send a status query ('?') and return the response if available.
     """
-    while True:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
         try:
-            state.conn.send('?')
-            response = state.conn.readline()
-            if "MPos" in response:
+            response = request_status(timeout=max(deadline - time.time(), 0.1))
+            if response and "MPos" in response:
                 logger.debug(f"Status response: {response}")
                 return response
         except Exception as e:
             logger.error(f"Error getting status response: {e}")
             return False
-        time.sleep(1)
-        
+    return None
+
 def parse_machine_position(response: str):
     """
     Parse the work position (MPos) from a status response.
@@ -213,148 +624,357 @@ def parse_machine_position(response: str):
         logger.error(f"Error parsing work position: {e}")
     return None
 
+def parse_status_report(response: str):
+    """
+    Parse the fields of a status report.
+    Expected format: "<Run|MPos:-994.869,-321.861,0.000|Bf:15,127|FS:600,0>"
+    Returns a dict with the machine state, machine position and, when reported,
+    free planner blocks, free RX bytes, current feed rate and feed override;
+    None if the report has no position.
+    """
+    if not response or not response.startswith("<"):
+        return None
+    fields = response.strip("<>").split("|")
+    report = {"state": fields[0].split(":")[0]}
+    try:
+        for field in fields[1:]:
+            name, _, value = field.partition(":")
+            values = value.split(",")
+            if name == "MPos":
+                report["machine_x"], report["machine_y"] = float(values[0]), float(values[1])
+            elif name == "Bf":
+                report["planner_blocks"], report["rx_bytes"] = int(values[0]), int(values[1])
+            elif name in ("FS", "F"):
+                report["feed"] = float(values[0])
+            elif name == "Ov":
+                report["feed_override"] = int(values[0])
+    except (ValueError, IndexError) as e:
+        logger.error(f"Error parsing status report: {e}")
+        return None
+    return report if "machine_x" in report else None
 
-def send_grbl_coordinates(x, y, speed=600, timeout=2, home=False):
+
+def wait_for_stream_drain(timeout=None) -> bool:
+    """Block until every command streamed over the connection has been acknowledged."""
+    if not state.conn or not state.conn.streamer:
+        return True
+    return state.conn.streamer.wait_until_drained(timeout)
+
+###############################################################################
+# Real-time Control
+###############################################################################
+
+_halt_lock = threading.Lock()
+
+def send_realtime(command: str) -> bool:
     """
-    Send a G-code command to FluidNC and wait for an 'ok' response.
-    If no response after set timeout, sets state to stop and disconnects.
+    Write a real-time command straight to the controller, bypassing the
+    streamer. Returns False if there is no connection to write to.
     """
-    logger.debug(f"Sending G-code: X{x} Y{y} at F{speed}")
-    
-    # Track overall attempt time
-    overall_start_time = time.time()
-    
-    while True:
-        try:
-            gcode = f"$J=G91 G21 Y{y} F{speed}" if home else f"G1 X{x} Y{y} F{speed}"
-            state.conn.send(gcode + "\n")
-            logger.debug(f"Sent command: {gcode}")
-            start_time = time.time()
-            while True:
-                response = state.conn.readline()
-                logger.debug(f"Response: {response}")
-                if response.lower() == "ok":
-                    logger.debug("Command execution confirmed.")
-                    return
-        except Exception as e:
-            # Store the error string inside the exception block
-            error_str = str(e)
-            logger.warning(f"Error sending command: {error_str}")
-            
-            # Immediately return for device not configured errors
-            if "Device not configured" in error_str or "Errno 6" in error_str:
-                logger.error(f"Device configuration error detected: {error_str}")
-                state.stop_requested = True
-                state.conn = None
-                state.is_connected = False
-                logger.info("Connection marked as disconnected due to device error")
-                return False
+    conn = state.conn
+    if not conn or not conn.is_connected():
+        return False
+    try:
+        conn.send_realtime(command)
+        return True
+    except Exception as e:
+        logger.error(f"Error sending real-time command: {str(e)}")
+        return False
 
-            
-        logger.warning(f"No 'ok' received for X{x} Y{y}, speed {speed}. Retrying...")
-        time.sleep(0.1)
-    
-    # If we reach here, the timeout has occurred
-    logger.error(f"Failed to receive 'ok' response after {max_total_attempt_time} seconds. Stopping and disconnecting.")
-    
-    # Set state to stop
-    state.stop_requested = True
-    
-    # Set connection status to disconnected
-    if state.conn:
-        try:
-            state.conn.disconnect()
-        except:
-            pass
-        state.conn = None
-        
-    # Update the state connection status
-    state.is_connected = False
-    logger.info("Connection marked as disconnected due to timeout")
-    return False
+def feed_hold() -> bool:
+    """Decelerate to a stop, keeping the queued moves and the position."""
+    return send_realtime(RT_FEED_HOLD)
+
+def cycle_start() -> bool:
+    """Resume the moves held by a feed hold."""
+    return send_realtime(RT_CYCLE_START)
 
-def get_machine_steps(timeout=10):
+def set_feed_override(percent) -> int:
     """
-    Get machine steps/mm from the GRBL controller.
-    Returns True if successful, False otherwise.
+    Step the controller's feed override to the level nearest `percent`.
+
+    The override scales every move, including those already in the planner,
+    so speed changes take effect immediately. Levels are whole percents from
+    FEED_OVERRIDE_MIN to FEED_OVERRIDE_MAX, reached with 10% and 1% steps from
+    the current level or from 100% after a reset, whichever is closer.
+    Returns the override in effect afterwards.
     """
-    if not state.conn or not state.conn.is_connected():
-        logger.error("Cannot get machine steps: No connection available")
+    conn = state.conn
+    if not conn:
+        return 100
+    target = int(round(min(max(percent, FEED_OVERRIDE_MIN), FEED_OVERRIDE_MAX)))
+    current = conn.feed_override
+    if target == current:
+        return current
+    commands = ""
+    if abs(target - 100) < abs(target - current):
+        commands += RT_FEED_OVR_RESET
+        current = 100
+    coarse, fine = divmod(abs(target - current), FEED_OVERRIDE_COARSE_STEP)
+    if target > current:
+        commands += RT_FEED_OVR_COARSE_PLUS * coarse + RT_FEED_OVR_FINE_PLUS * fine
+    else:
+        commands += RT_FEED_OVR_COARSE_MINUS * coarse + RT_FEED_OVR_FINE_MINUS * fine
+    if commands and not send_realtime(commands):
+        return conn.feed_override
+    conn.feed_override = target
+    logger.info(f"Feed override set to {target}%")
+    return target
+
+def reset_feed_override() -> bool:
+    """Put the feed override back to 100%, whatever the controller had."""
+    if not send_realtime(RT_FEED_OVR_RESET):
         return False
+    state.conn.feed_override = 100
+    return True
 
-    x_steps_per_mm = None
-    y_steps_per_mm = None
-    gear_ratio = None
-    start_time = time.time()
+def wait_for_hold(timeout=5):
+    """
+    Poll until the controller has finished decelerating. Returns the status
+    report once it is in Hold:0, Idle or Alarm, None on timeout.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = request_status(timeout=HOLD_POLL_INTERVAL_S * 5)
+        if response and response.startswith(("<Hold:0", "<Idle", "<Alarm")):
+            return response
+        time.sleep(HOLD_POLL_INTERVAL_S)
+    return None
+
+def resync_position() -> bool:
+    """Read the machine position back and derive theta/rho from it."""
+    machine_x, machine_y = get_machine_position()
+    if machine_x is None:
+        return False
+    if state.x_steps_per_mm and state.y_steps_per_mm and state.gear_ratio:
+        state.current_theta, state.current_rho = compute_polar_coordinates_from_state(machine_x, machine_y, state)
+    state.machine_x, state.machine_y = machine_x, machine_y
+    state.save()
+    logger.info(f"Position resynced: theta={state.current_theta:.3f}, rho={state.current_rho:.3f}")
+    return True
+
+def _reopen_streamer(streamer, halted):
+    halted.wait()
+    streamer.reopen()
+
+def _close_streamer():
+    """
+    Stop the streamer sending, so the motion job can't slip queued moves in
+    after the reset. Returns the event to set once the halt is over, which a
+    job queued behind the running one waits for to reopen the streamer, and
+    the streamer the halt reopens itself when it runs on the motion executor.
+    """
+    halted = threading.Event()
+    streamer = state.conn.streamer if state.conn else None
+    if streamer is None:
+        return halted, None
+    streamer.halt()
+    if motion_executor.is_executor_thread():
+        # The motion job halts the controller itself and goes on from there
+        return halted, streamer
+    motion_executor.submit(_reopen_streamer, streamer, halted)
+    return halted, None
+
+def halt(requested_at=None):
+    """
+    Stop the ball and throw away every queued move.
+
+    A feed hold stops the motion first so the controller keeps its position,
+    then a soft reset flushes the planner and RX buffer while the streamer
+    forgets its in-flight lines, so neither queue replays anything. The
+    streamer stays halted until the motion job that was running has exited,
+    so none of its moves can follow the reset. The position the ball stopped
+    at is read back into state afterwards.
+
+    Returns the measured latencies in seconds since `requested_at`: until
+    the feed hold was written ("command"), until the controller reported
+    being stopped ("hold") and until it was back after the reset ("reset").
+    """
+    return _run_halt(requested_at or time.time(), *_close_streamer())
+
+def halt_in_background(requested_at=None):
+    """
+    Start halt() on a thread of its own, for callers whose motion job may be
+    blocked on the controller until the queues are flushed. The streamer is
+    closed before this returns, so no motion job queued afterwards sends
+    anything before the halt is over.
+    """
+    threading.Thread(target=_run_halt, args=(requested_at or time.time(),) + _close_streamer(),
+                     name="halt", daemon=True).start()
 
-    # Clear any pending data in the buffer
+def _run_halt(requested_at, halted, streamer):
     try:
-        while state.conn.in_waiting() > 0:
-            state.conn.readline()
+        return _halt(requested_at)
+    finally:
+        halted.set()
+        if streamer:
+            streamer.reopen()
+
+def _halt(requested_at):
+    with _halt_lock:
+        if not feed_hold():
+            return None
+        latency = {"command": time.time() - requested_at}
+        conn = state.conn
+        if wait_for_hold() is None:
+            logger.warning("Controller did not report a completed feed hold, resetting anyway")
+        latency["hold"] = time.time() - requested_at
+
+        ack_ledger.abort()
+        # The banner the controller prints after this reset is ours
+        conn.reset_pending = True
+        send_realtime(RT_SOFT_RESET)
+        if conn.streamer:
+            conn.streamer.reset()
+        if conn.encoder:
+            conn.encoder.reset()
+        # Overrides are back at their defaults after a reset
+        conn.feed_override = 100
+        # The controller ignores '?' while it restarts, keep asking until it answers
+        response = None
+        deadline = time.time() + 5
+        while response is None and time.time() < deadline:
+            response = request_status(timeout=HOLD_POLL_INTERVAL_S * 5)
+        latency["reset"] = time.time() - requested_at
+        if response and response.startswith("<Alarm"):
+            logger.warning("Controller is in alarm after the reset, unlocking")
+            conn.streamer.send_line("$X", force=True)
+            conn.streamer.wait_until_drained(2)
+        conn.reset_pending = False
+        resync_position()
+
+    state.last_stop_latency = latency
+    logger.info(f"Stopped: feed hold sent after {latency['command'] * 1000:.1f}ms, "
+                f"motion stopped after {latency['hold'] * 1000:.0f}ms, "
+                f"queues flushed after {latency['reset'] * 1000:.0f}ms")
+    if latency["command"] > STOP_LATENCY_TARGET_S:
+        logger.warning(f"Stop took {latency['command'] * 1000:.0f}ms to reach the controller, "
+                       f"above the {STOP_LATENCY_TARGET_S * 1000:.0f}ms target")
+    return latency
+
+def send_grbl_coordinates(x, y, speed=600, timeout=2, home=False):
+    """
+    Send a move to FluidNC. Jog commands used for homing always wait for their 'ok'.
+    """
+    logger.debug(f"Sending G-code: X{x} Y{y} at F{speed}")
+    if home:
+        gcode = f"$J=G91 G21 Y{y} F{speed}"
+    else:
+        gcode = state.conn.encoder.encode_move(x, y, speed)
+    return send_command(gcode, wait=home)
+
+def send_command(gcode, wait=False, tag=None):
+    """
+    Send a G-code line to FluidNC.
+
+    Every line goes through the connection's streamer so its ack is matched
+    in order, whichever mode is used. In send-and-wait mode (or with wait=True)
+    this blocks until the controller answers 'ok'. In character-counting mode
+    the command is queued behind the ones already in the controller's RX buffer
+    and this returns as soon as it has been written.
+    A tag (pattern point index) is passed on to the ack ledger once acknowledged.
+
+    Returns True once sent, False if a stop was requested or the link failed.
+    Failed writes are reported to the connection supervisor, which reconnects.
+    """
+    conn = state.conn
+    if not conn or not conn.streamer:
+        return False
+    try:
+        if not conn.streamer.send_line(gcode, tag):
+            return False
+        if wait or conn.stream_mode == STREAM_MODE_SEND_WAIT:
+            conn.streamer.wait_until_drained()
+            if conn.streamer.failed:
+                return False
+            logger.debug("Command execution confirmed.")
+        return True
     except Exception as e:
-        logger.warning(f"Error clearing buffer: {e}")
+        logger.error(f"Error sending command: {str(e)}")
+        from modules.connection.connection_supervisor import connection_supervisor
+        connection_supervisor.report_failure(f"Write failed: {str(e)}")
+        return False
+
+def read_settings(timeout=SETTINGS_TIMEOUT_S) -> dict:
+    """
+    Dump the controller's settings with '$$'.
+    Returns a dict of setting ("$100") to value string, empty on failure.
+    """
+    if not state.conn or not state.conn.is_connected():
+        logger.error("Cannot read settings: No connection available")
+        return {}
+
+    # Drop settings lines left over from an earlier dump
+    state.conn.router.clear_settings()
 
     # Send the command to request all settings
     try:
         logger.info("Requesting GRBL settings with $$ command")
-        state.conn.send("$$\n")
-        time.sleep(0.5)  # Give GRBL a moment to process and respond
+        state.conn.streamer.send_line("$$")
     except Exception as e:
         logger.error(f"Error sending $$ command: {e}")
-        return False
+        return {}
+
+    # The dump ends with the ack of '$$', and the response router queues every
+    # settings line before handing that ack over
+    if not state.conn.streamer.wait_until_drained(timeout):
+        logger.warning("Settings dump was not acknowledged, using the settings received so far")
 
-    # Wait for and process responses
-    settings_complete = False
-    while time.time() - start_time < timeout and not settings_complete:
+    settings = {}
+    while True:
+        response = state.conn.router.next_setting(timeout=0)
+        if response is None:
+            break
+        for line in response.splitlines():
+            name, _, value = line.strip().partition("=")
+            if value:
+                logger.debug(f"Config response: {line}")
+                settings[name] = value
+    return settings
+
+def apply_machine_settings(settings: dict) -> bool:
+    """
+    Take the table's configuration from a settings dict as read by
+    read_settings. Returns True if steps/mm and gear ratio were all in it.
+    """
+    x_steps_per_mm = None
+    y_steps_per_mm = None
+    gear_ratio = None
+    for name, value in settings.items():
         try:
-            # Attempt to read a line from the connection
-            if state.conn.in_waiting() > 0:
-                response = state.conn.readline()
-                logger.debug(f"Raw response: {response}")
-                
-                # Process the line
-                if response.strip():  # Only process non-empty lines
-                    for line in response.splitlines():
-                        line = line.strip()
-                        logger.debug(f"Config response: {line}")
-                        if line.startswith("$100="):
-                            x_steps_per_mm = float(line.split("=")[1])
-                            state.x_steps_per_mm = x_steps_per_mm
-                            logger.info(f"X steps per mm: {x_steps_per_mm}")
-                        elif line.startswith("$101="):
-                            y_steps_per_mm = float(line.split("=")[1])
-                            state.y_steps_per_mm = y_steps_per_mm
-                            logger.info(f"Y steps per mm: {y_steps_per_mm}")
-                        elif line.startswith("$131="):
-                            gear_ratio = float(line.split("=")[1])
-                            state.gear_ratio = gear_ratio
-                            logger.info(f"Gear ratio: {gear_ratio}")
-                        elif line.startswith("$22="):
-                            # $22 reports if the homing cycle is enabled
-                            # returns 0 if disabled, 1 if enabled
-                            homing = int(line.split('=')[1])
-                            state.homing = homing
-                            logger.info(f"Homing enabled: {homing}")
-                
-                # Check if we've received all the settings we need
-                if x_steps_per_mm is not None and y_steps_per_mm is not None and gear_ratio is not None:
-                    settings_complete = True
-            else:
-                # No data waiting, small sleep to prevent CPU thrashing
-                time.sleep(0.1)
-                
-                # If it's taking too long, try sending the command again after 3 seconds
-                elapsed = time.time() - start_time
-                if elapsed > 3 and elapsed < 4:
-                    logger.warning("No response yet, sending $$ command again")
-                    state.conn.send("$$\n")
+            if name == "$100":
+                x_steps_per_mm = float(value)
+                state.x_steps_per_mm = x_steps_per_mm
+                logger.info(f"X steps per mm: {x_steps_per_mm}")
+            elif name == "$101":
+                y_steps_per_mm = float(value)
+                state.y_steps_per_mm = y_steps_per_mm
+                logger.info(f"Y steps per mm: {y_steps_per_mm}")
+            elif name == "$131":
+                gear_ratio = float(value)
+                state.gear_ratio = gear_ratio
+                logger.info(f"Gear ratio: {gear_ratio}")
+            elif name == "$22":
+                # $22 reports if the homing cycle is enabled
+                # returns 0 if disabled, 1 if enabled
+                homing = int(value)
+                state.homing = homing
+                logger.info(f"Homing enabled: {homing}")
+            elif name == "$110":
+                state.x_max_rate = float(value)
+            elif name == "$111":
+                state.y_max_rate = float(value)
+            elif name == "$120":
+                state.x_acceleration = float(value)
+            elif name == "$121":
+                state.y_acceleration = float(value)
+            elif name == "$11":
+                state.junction_deviation = float(value)
+        except ValueError as e:
+            logger.error(f"Error parsing setting {name}={value}: {e}")
 
-        except Exception as e:
-            logger.error(f"Error getting machine steps: {e}")
-            time.sleep(0.5)
-    
     # Process results and determine table type
-    if settings_complete:
+    if x_steps_per_mm is not None and y_steps_per_mm is not None and gear_ratio is not None:
         if y_steps_per_mm == 180:
             state.table_type = 'dune_weaver_mini'
         elif y_steps_per_mm >= 320:
@@ -365,47 +985,104 @@ def get_machine_steps(timeout=10):
             state.table_type = None
             logger.warning(f"Unknown table type with Y steps/mm: {y_steps_per_mm}")
         logger.info(f"Machine type detected: {state.table_type}")
+        if state.conn and state.conn.encoder:
+            state.conn.encoder.set_resolution(x_steps_per_mm, y_steps_per_mm)
         return True
     else:
         missing = []
         if x_steps_per_mm is None: missing.append("X steps/mm")
         if y_steps_per_mm is None: missing.append("Y steps/mm")
         if gear_ratio is None: missing.append("gear ratio")
-        logger.error(f"Failed to get all machine parameters after {timeout}s. Missing: {', '.join(missing)}")
+        logger.error(f"Failed to get all machine parameters. Missing: {', '.join(missing)}")
         return False
 
-def home():
+def get_machine_steps(timeout=SETTINGS_TIMEOUT_S):
     """
-    Perform homing by checking device configuration and sending the appropriate commands.
+    Get machine steps/mm from the GRBL controller.
+    Returns True if successful, False otherwise.
     """
- """   try:
-        if state.homing:
-            logger.info("Using sensorless homing")
-            state.conn.send("$H\n")
-            state.conn.send("G1 Y0 F100\n")
-        else:
-            homing_speed = 400
-            if state.table_type == 'dune_weaver_mini':
-                homing_speed = 120
-            logger.info("Sensorless homing not supported. Using crash homing")
-            logger.info(f"Homing with speed {homing_speed}")
-            if state.gear_ratio == 6.25:
-                send_grbl_coordinates(0, - 30, homing_speed, home=True)
-                state.machine_y -= 30
-            else:
-                send_grbl_coordinates(0, -22, homing_speed, home=True)
-                state.machine_y -= 22
+    return apply_machine_settings(read_settings(timeout))
+
+def get_firmware_fingerprint(timeout=SETTINGS_TIMEOUT_S):
+    """
+    Return a short hash of the controller's build info ($I). It changes with
+    the firmware build and, on FluidNC, with the machine name of the config.
+    Returns None if the controller did not report any.
+    """
+    conn = state.conn
+    lines = []
 
-        state.current_theta = state.current_rho = 0
+    def collect(line):
+        if line.startswith(("[VER:", "[OPT:")):
+            lines.append(line)
+
+    conn.router.subscribe(RESPONSE_EVENT, collect)
+    try:
+        conn.streamer.send_line("$I")
+        conn.streamer.wait_until_drained(timeout)
     except Exception as e:
-        logger.error(f"Error homing: {e}")
-     return False """
-"""
+        logger.error(f"Error reading build info: {str(e)}")
+    finally:
+        conn.router.unsubscribe(RESPONSE_EVENT, collect)
+    if not lines:
+        return None
+    return hashlib.sha1("\n".join(lines).encode()).hexdigest()[:16]
+
+def cache_settings(key, settings):
+    """Remember the settings read for a port and firmware build."""
+    state.settings_cache.pop(key, None)
+    state.settings_cache[key] = settings
+    # Oldest entries go first
+    while len(state.settings_cache) > SETTINGS_CACHE_SIZE:
+        state.settings_cache.pop(next(iter(state.settings_cache)))
+    state.save()
+
+def load_machine_settings():
+    """
+    Apply the controller's settings. If the port and firmware fingerprint
+    match a cached set, that is used straight away and checked against a
+    '$$' dump in the background; otherwise the settings are dumped now.
+    Returns True if the table's configuration is complete.
+    """
+    fingerprint = get_firmware_fingerprint()
+    key = f"{state.port}|{fingerprint}" if fingerprint else None
+    cached = state.settings_cache.get(key) if key else None
+    if cached and apply_machine_settings(cached):
+        logger.info(f"Using cached controller settings for {state.port}")
+        threading.Thread(target=refresh_machine_settings, args=(key, state.conn),
+                         name="settings-refresh", daemon=True).start()
+        return True
+
+    settings = read_settings()
+    if not apply_machine_settings(settings):
+        return False
+    if key:
+        cache_settings(key, settings)
+    return True
+
+def refresh_machine_settings(key, conn):
+    """Dump the settings again and update state and cache if they changed since cached."""
+    # '$$' is refused while the machine moves, so only refresh an idle controller
+    response = request_status() if state.conn is conn else None
+    if not response or not response.startswith("<Idle"):
+        logger.debug("Controller busy, skipping settings refresh")
+        return
+    settings = read_settings()
+    if not settings or settings == state.settings_cache.get(key):
+        return
+    logger.warning("Controller settings changed since they were cached, updating")
+    if apply_machine_settings(settings):
+        cache_settings(key, settings)
+
+def home():
+    """
     Perform homing using FluidNC's built-in homing via hall effect (limit) switches.
     """
     try:
         logger.info("Using hardware (hall effect sensor) homing via FluidNC")
-        state.conn.send("$H\n")  # Initiate homing cycle
+        state.conn.streamer.send_line("$H")  # Initiate homing cycle
+        if state.conn.encoder:
+            state.conn.encoder.reset()
         check_idle()  # Wait for completion
         state.current_theta = 0
         state.current_rho = 0
@@ -413,19 +1090,95 @@ def home():
         logger.error(f"Error homing: {e}")
         return False
 
+def wait_for_idle(timeout=None) -> bool:
+    """
+    Block until the controller has executed everything it was sent.
+
+    Waits for the streamer to drain, then polls '?' every IDLE_POLL_INTERVAL_S
+    while the planner runs out of moves and returns on the first Idle report
+    the response router sees. Returns False on timeout.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining():
+        return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+    while deadline is None or time.monotonic() < deadline:
+        conn = state.conn
+        if not conn or not conn.router or not conn.is_connected():
+            # The supervisor may be reconnecting
+            time.sleep(IDLE_POLL_INTERVAL_S)
+            continue
+        if conn.streamer and not conn.streamer.wait_until_drained(remaining()):
+            return False
+        # Only a report requested from here on tells that the last move has finished
+        conn.router.idle.clear()
+        while conn is state.conn and conn.is_connected():
+            try:
+                conn.send('?')
+            except Exception as e:
+                logger.error(f"Error polling for idle: {str(e)}")
+                break
+            wait = IDLE_POLL_INTERVAL_S if deadline is None else min(IDLE_POLL_INTERVAL_S, remaining())
+            if conn.router.idle.wait(wait):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if conn.streamer and conn.streamer.in_flight:
+                # More was streamed meanwhile
+                break
+    return False
+
+async def wait_for_idle_async(timeout=None) -> bool:
+    """
+    Await the end of motion without parking a thread on it. Same as
+    wait_for_idle, with the polling done from the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    idle = None
+    idle_router = None
+    try:
+        while deadline is None or loop.time() < deadline:
+            conn = state.conn
+            if not conn or not conn.router or not conn.is_connected() or (conn.streamer and conn.streamer.in_flight):
+                # Not connected, or lines still waiting for their acks
+                if idle:
+                    idle.cancel()
+                    idle = None
+                await asyncio.sleep(IDLE_POLL_INTERVAL_S)
+                continue
+            if idle is None or idle_router is not conn.router:
+                if idle:
+                    idle.cancel()
+                # Only a report requested from here on tells that the last move has finished
+                idle_router = conn.router
+                idle_router.idle.clear()
+                idle = asyncio.ensure_future(idle_router.until_idle())
+            try:
+                await conn.send_async('?')
+            except Exception as e:
+                logger.error(f"Error polling for idle: {str(e)}")
+            done, _ = await asyncio.wait({idle}, timeout=IDLE_POLL_INTERVAL_S)
+            if done:
+                return True
+        return False
+    finally:
+        if idle and not idle.done():
+            idle.cancel()
+
 def check_idle():
     """
-    Continuously check if the device is idle.
+    Wait until the device is idle.
     """
     logger.info("Checking idle")
-    while True:
-        response = get_status_response()
-        if response and "Idle" in response:
-            logger.info("Device is idle")
-            update_machine_position()
-            return True
-        time.sleep(1)
-        
+    wait_for_idle()
+    logger.info("Device is idle")
+    if state.conn and state.conn.streamer:
+        # An idle controller has acknowledged everything it was sent
+        state.conn.streamer.reset()
+    update_machine_position()
+    return True
 
 def get_machine_position(timeout=5):
     """
@@ -434,10 +1187,9 @@ def get_machine_position(timeout=5):
     start_time = time.time()
     while time.time() - start_time < timeout:
         try:
-            state.conn.send('?')
-            response = state.conn.readline()
+            response = request_status(timeout=max(timeout - (time.time() - start_time), 0.1))
             logger.debug(f"Raw status response: {response}")
-            if "MPos" in response:
+            if response and "MPos" in response:
                 pos = parse_machine_position(response)
                 if pos:
                     machine_x, machine_y = pos
@@ -445,7 +1197,7 @@ def get_machine_position(timeout=5):
                     return machine_x, machine_y
         except Exception as e:
             logger.error(f"Error getting machine position: {e}")
-            return
+            return None, None
         time.sleep(0.1)
     logger.warning("Timeout reached waiting for machine position")
     return None, None
@@ -454,7 +1206,11 @@ def update_machine_position():
     if (state.conn.is_connected() if state.conn else False):
         try:
             logger.info('Saving machine position')
-            state.machine_x, state.machine_y = get_machine_position()
+            machine_x, machine_y = get_machine_position()
+            if machine_x is None:
+                # Keep the last known position rather than forgetting it
+                return
+            state.machine_x, state.machine_y = machine_x, machine_y
             state.save()
             logger.info(f'Machine position saved: {state.machine_x}, {state.machine_y}')
         except Exception as e:
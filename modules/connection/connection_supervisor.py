@@ -0,0 +1,196 @@
+"""Watch the controller link, reconnect when it fails and continue the interrupted stream."""
+import asyncio
+import logging
+import threading
+import time
+
+from modules.connection import connection_manager
+from modules.connection.serial_transport import get_event_loop
+from modules.core.ack_ledger import ack_ledger
+from modules.core.motion_executor import motion_executor
+from modules.core.state import state
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL_S = 0.5
+# An in-flight line may wait this long for its ack before the link is probed
+ACK_TIMEOUT_S = 10.0
+# The controller must answer a status query within this time to count as alive
+PROBE_TIMEOUT_S = 2.0
+# Reconnect delays double from the initial one up to the maximum
+BACKOFF_INITIAL_S = 1.0
+BACKOFF_MAX_S = 30.0
+# Longest wait for the interrupted job to leave the motion executor
+JOB_EXIT_TIMEOUT_S = 15.0
+
+class ConnectionSupervisor:
+    """
+    Detect a dead controller link and recover from it.
+
+    A link counts as failed when a write raises, the transport closes without
+    close() being called, or the oldest in-flight line has waited ACK_TIMEOUT_S
+    for its ack and a status query goes unanswered too. Long moves and feed
+    holds stall acks as well, but the controller still answers '?' then.
+
+    On failure, the streamer's waiters are released so the running pattern
+    ends, and state.link_interrupted holds the playlist until it has been
+    continued. restart_connection is then retried with exponential backoff.
+    If a pattern was streaming, it is continued from the checkpoint of the
+    point the ack ledger last saw executed, without homing when the
+    controller kept its position.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        # Reason of the failure being recovered from, None while healthy
+        self.failure = None
+        self.interrupted_stream = False
+        self.last_failure = None
+        self.last_failure_time = None
+        self.next_probe = 0
+        self.counters = {
+            "link_failures": 0,
+            "write_errors": 0,
+            "ack_timeouts": 0,
+            "slow_acks": 0,
+            "reconnect_attempts": 0,
+            "reconnects": 0,
+            "resumed_streams": 0,
+        }
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="connection-supervisor", daemon=True)
+        self.thread.start()
+        logger.info("Connection supervisor started")
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def report_failure(self, reason):
+        """
+        Report that the link failed. Safe to call from any thread, recovery
+        runs on the supervisor's own.
+        """
+        with self.lock:
+            if self.failure:
+                return
+            self.failure = reason
+            self.last_failure = reason
+            self.last_failure_time = time.time()
+            self.counters["link_failures"] += 1
+            if reason.startswith("Write failed"):
+                self.counters["write_errors"] += 1
+            self.interrupted_stream = ack_ledger.active
+        logger.error(f"Controller link failed: {reason}")
+        # Playback stops where it is, the stream is continued after reconnecting
+        state.link_interrupted = True
+        conn = state.conn
+        if conn and conn.streamer:
+            conn.streamer.abort()
+        self.wake_event.set()
+
+    def health(self):
+        """Counters and the current state of the link."""
+        conn = state.conn
+        with self.lock:
+            health = dict(self.counters)
+            health.update({
+                "state": "reconnecting" if self.failure else ("connected" if conn and conn.is_connected() else "disconnected"),
+                "last_failure": self.last_failure,
+                "last_failure_time": self.last_failure_time,
+            })
+        health["ack_age"] = conn.streamer.ack_age() if conn and conn.streamer else 0.0
+        return health
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wake_event.wait(CHECK_INTERVAL_S)
+            self.wake_event.clear()
+            try:
+                if self.failure:
+                    self._recover()
+                else:
+                    self._check()
+            except Exception as e:
+                logger.error(f"Error supervising connection: {str(e)}")
+
+    def _check(self):
+        conn = state.conn
+        if not conn or conn.closed or not conn.streamer:
+            return
+        if not conn.is_connected():
+            self.report_failure("Connection lost")
+            return
+        age = conn.streamer.ack_age()
+        if age < ACK_TIMEOUT_S or time.monotonic() < self.next_probe:
+            return
+        try:
+            alive = connection_manager.request_status(timeout=PROBE_TIMEOUT_S) is not None
+        except Exception:
+            alive = False
+        if alive:
+            # Slow, e.g. a long move or a feed hold, but the controller is there
+            with self.lock:
+                self.counters["slow_acks"] += 1
+            self.next_probe = time.monotonic() + ACK_TIMEOUT_S
+            return
+        with self.lock:
+            self.counters["ack_timeouts"] += 1
+        self.report_failure(f"No ack for {age:.0f}s and no reply to a status query")
+
+    def _recover(self):
+        # Let the interrupted job see the stop and leave the executor
+        try:
+            motion_executor.submit(lambda: None).result(timeout=JOB_EXIT_TIMEOUT_S)
+        except Exception:
+            logger.warning("Motion executor still busy, reconnecting anyway")
+
+        delay = BACKOFF_INITIAL_S
+        while not self.stop_event.is_set():
+            with self.lock:
+                self.counters["reconnect_attempts"] += 1
+            if connection_manager.restart_connection(homing=False):
+                break
+            logger.warning(f"Reconnect failed, retrying in {delay:.0f}s")
+            self.stop_event.wait(delay)
+            delay = min(delay * 2, BACKOFF_MAX_S)
+        else:
+            return
+
+        with self.lock:
+            self.counters["reconnects"] += 1
+            self.failure = None
+            interrupted, self.interrupted_stream = self.interrupted_stream, False
+        logger.info("Controller link restored")
+        loop = get_event_loop()
+        if interrupted and loop is not None:
+            asyncio.run_coroutine_threadsafe(self._continue_stream(), loop)
+        else:
+            state.link_interrupted = False
+
+    async def _continue_stream(self):
+        from modules.core import pattern_manager
+        # The interrupted run winds down once the new connection answers
+        while pattern_manager.pattern_lock.locked():
+            await asyncio.sleep(0.1)
+        try:
+            if not state.link_interrupted or state.stop_requested:
+                logger.info("Playback was stopped, not continuing the interrupted pattern")
+                return
+            # Within a playlist the run keeps the playlist's state
+            if await pattern_manager.resume_interrupted_pattern(rehome=False,
+                                                                is_playlist=state.current_playlist is not None):
+                with self.lock:
+                    self.counters["resumed_streams"] += 1
+        finally:
+            state.link_interrupted = False
+
+
+# Create a singleton instance that you can import elsewhere:
+connection_supervisor = ConnectionSupervisor()
@@ -0,0 +1,112 @@
+"""Compact G-code wire encoding for streaming moves over slow serial links."""
+import math
+
+# Used until the controller has reported its steps/mm
+DEFAULT_DECIMALS = 3
+
+def get_decimals(steps_per_mm):
+    """
+    Return the number of decimals needed to address every step of an axis.
+    Rounding to 10^-decimals mm is then never off by more than half a step.
+    """
+    if not steps_per_mm or steps_per_mm <= 0:
+        return DEFAULT_DECIMALS
+    return max(0, math.ceil(math.log10(steps_per_mm)))
+
+def format_units(units, decimals):
+    """Format an integer count of 10^-decimals mm with no redundant zeros."""
+    if decimals == 0:
+        return str(units)
+    sign = "-" if units < 0 else ""
+    whole, fraction = divmod(abs(units), 10 ** decimals)
+    fraction_str = str(fraction).rjust(decimals, "0").rstrip("0")
+    return f"{sign}{whole}.{fraction_str}" if fraction_str else f"{sign}{whole}"
+
+def format_value(value, decimals):
+    return format_units(round(value * 10 ** decimals), decimals)
+
+def format_feed(feed):
+    return format_value(feed, 1)
+
+def encode_incremental_moves(deltas_x, deltas_y, x_decimals, y_decimals):
+    """
+    Encode incremental (G91) moves given as integer counts of 10^-decimals mm.
+
+    Only the first line carries G1, later lines rely on it being modal. Axes
+    that don't move are left out, a move that goes nowhere is sent as X0 so
+    every move still produces exactly one line.
+    """
+    lines = []
+    motion = "G1"
+    for dx, dy in zip(deltas_x, deltas_y):
+        line = motion
+        if dx:
+            line += "X" + format_units(dx, x_decimals)
+        if dy:
+            line += "Y" + format_units(dy, y_decimals)
+        if not dx and not dy:
+            line += "X0"
+        lines.append(line)
+        motion = ""
+    return lines
+
+class GCodeEncoder:
+    """
+    Encode moves as compactly as the controller will accept them.
+
+    G1 and F are only sent when they change, absolute axis values only when they
+    differ from the last one sent, numbers carry no more decimals than the axis
+    resolution needs and no spaces are sent. The encoder mirrors the controller's
+    modal state, so it must be reset whenever that state may have changed behind
+    its back (new connection, homing, reset, raw commands).
+    """
+    def __init__(self, x_steps_per_mm=None, y_steps_per_mm=None):
+        self.set_resolution(x_steps_per_mm, y_steps_per_mm)
+        self.reset()
+
+    def set_resolution(self, x_steps_per_mm, y_steps_per_mm):
+        self.x_decimals = get_decimals(x_steps_per_mm)
+        self.y_decimals = get_decimals(y_steps_per_mm)
+
+    def reset(self):
+        """Forget the controller's modal state so the next move is fully specified."""
+        self.motion = None
+        self.feed = None
+        self.x = None
+        self.y = None
+
+    def encode_move(self, x, y, feed):
+        """Encode an absolute (G90) linear move."""
+        line = "" if self.motion == "G1" else "G1"
+        x_str = format_value(x, self.x_decimals)
+        y_str = format_value(y, self.y_decimals)
+        if x_str != self.x:
+            line += "X" + x_str
+        if y_str != self.y:
+            line += "Y" + y_str
+        feed_str = format_feed(feed)
+        if feed_str != self.feed:
+            line += "F" + feed_str
+        if line == "":
+            # Already there at this feed, restate one axis so the move still gets an ack
+            line = "X" + x_str
+        self.motion, self.x, self.y, self.feed = "G1", x_str, y_str, feed_str
+        return line
+
+    def encode_feed(self, feed):
+        """Encode a feed rate change on its own line."""
+        self.feed = format_feed(feed)
+        return "F" + self.feed
+
+    def append_feed(self, line, feed):
+        """Add F to an already encoded line, only if the feed rate changes."""
+        feed_str = format_feed(feed)
+        if feed_str == self.feed:
+            return line
+        self.feed = feed_str
+        return line + "F" + feed_str
+
+    def forget_position(self):
+        """Forget the last absolute position, e.g. after incremental moves."""
+        self.x = None
+        self.y = None
@@ -0,0 +1,209 @@
+"""Background reader that sorts controller output by kind and hands it to the right consumer."""
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Kinds of lines a GRBL/FluidNC controller sends
+RESPONSE_ACK = 'ack'          # "ok" / "error:N" answering a line we sent
+RESPONSE_STATUS = 'status'    # "<Idle|MPos:...|...>" answering a '?'
+RESPONSE_SETTING = 'setting'  # "$100=200.000" lines of a settings dump
+RESPONSE_EVENT = 'event'      # "[MSG:...]", "ALARM:N", banners and anything else
+RESPONSE_KINDS = (RESPONSE_ACK, RESPONSE_STATUS, RESPONSE_SETTING, RESPONSE_EVENT)
+
+def classify_response(line: str) -> str:
+    """Return which kind of controller output a line is."""
+    lowered = line.lower()
+    if lowered == "ok" or lowered.startswith("error"):
+        return RESPONSE_ACK
+    if line.startswith("<") and line.endswith(">"):
+        return RESPONSE_STATUS
+    if line.startswith("$") and "=" in line:
+        return RESPONSE_SETTING
+    return RESPONSE_EVENT
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+class ResponseRouter:
+    """
+    Own every read from a connection and route each line to its consumer.
+
+    Only this reader calls readline(), so a status query can never swallow the
+    'ok' a streamed command is waiting for and vice versa. Acks go to the
+    connection's streamer, status reports are kept as the latest report for
+    anyone waiting on one, settings lines are queued for whoever requested the
+    dump and events are logged. A startup banner nobody expected means the
+    controller reset, which is reported as a link failure. Extra consumers can
+    subscribe to any kind.
+
+    Status reports also drive the idle event: it is set by an Idle report that
+    arrives while no streamed line awaits its ack, and cleared by any other
+    report or a newly streamed line. Threads wait on it directly, coroutines
+    await until_idle().
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.listeners = {kind: [] for kind in RESPONSE_KINDS}
+        self.status_cond = threading.Condition()
+        self.last_status = None
+        self.last_status_time = None
+        self.status_count = 0
+        self.idle = threading.Event()
+        self.idle_waiters = []
+        self.settings = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="response-router", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        with self.status_cond:
+            self.status_cond.notify_all()
+
+    def subscribe(self, kind: str, callback):
+        """Call callback(line) from the reader thread for every line of this kind."""
+        self.listeners[kind].append(callback)
+
+    def unsubscribe(self, kind: str, callback):
+        if callback in self.listeners[kind]:
+            self.listeners[kind].remove(callback)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                line = self.conn.readline()
+            except Exception as e:
+                if self.stopped.is_set() or not self.conn.is_connected():
+                    break
+                # Read timeouts surface as exceptions on some transports
+                logger.debug(f"Read failed: {str(e)}")
+                time.sleep(0.1)
+                continue
+            if not line:
+                if not self.conn.is_connected():
+                    break
+                continue
+            try:
+                self.dispatch(line)
+            except Exception as e:
+                logger.error(f"Error handling controller response '{line}': {str(e)}")
+        logger.debug("Response router stopped")
+
+    def dispatch(self, line: str) -> str:
+        """Route a single line and return its kind."""
+        kind = classify_response(line)
+        if kind == RESPONSE_ACK:
+            if self.conn.streamer:
+                self.conn.streamer.handle_response(line)
+        elif kind == RESPONSE_STATUS:
+            with self.status_cond:
+                self.last_status = line
+                self.last_status_time = time.time()
+                self.status_count += 1
+                self.status_cond.notify_all()
+            streamer = self.conn.streamer
+            if line.startswith("<Idle") and not (streamer and streamer.in_flight):
+                self._signal_idle()
+            else:
+                self.idle.clear()
+        elif kind == RESPONSE_SETTING:
+            self.settings.put(line)
+        elif line.startswith("Grbl"):
+            self._controller_reset(line)
+        elif line.startswith("ALARM") or line.startswith("[MSG:ERR"):
+            logger.warning(f"Controller: {line}")
+        else:
+            logger.debug(f"Controller: {line}")
+
+        for callback in list(self.listeners[kind]):
+            try:
+                callback(line)
+            except Exception as e:
+                logger.error(f"Error in {kind} listener: {str(e)}")
+        return kind
+
+    def _controller_reset(self, line: str):
+        """
+        Handle a startup banner. Unless halt() reset the controller, it reset
+        by itself: the lines in flight were lost and its modal state and
+        position are back at their defaults, so the link is reported failed
+        and recovered like a lost one.
+        """
+        if self.conn.reset_pending:
+            logger.debug(f"Controller: {line}")
+            return
+        logger.warning(f"Controller reset unexpectedly: {line}")
+        if self.conn.streamer:
+            self.conn.streamer.reset()
+        if self.conn.encoder:
+            self.conn.encoder.reset()
+        from modules.connection.connection_supervisor import connection_supervisor
+        connection_supervisor.report_failure("Controller reset")
+
+    def wait_for_status(self, timeout: float = None, after: int = None):
+        """
+        Wait for a status report newer than `after` (default: the latest one
+        received so far) and return it, or None on timeout.
+        """
+        with self.status_cond:
+            seen = self.status_count if after is None else after
+            if not self.status_cond.wait_for(lambda: self.status_count > seen or self.stopped.is_set(), timeout):
+                return None
+            return self.last_status if self.status_count > seen else None
+
+    def _signal_idle(self):
+        with self.status_cond:
+            self.idle.set()
+            waiters, self.idle_waiters = self.idle_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def mark_busy(self):
+        """Note that motion was queued, the controller is not idle until it reports so again."""
+        if self.idle.is_set():
+            self.idle.clear()
+
+    async def until_idle(self):
+        """
+        Resolve on the next Idle report (right away if the last report was
+        one). Reports only arrive in answer to '?', so someone must be polling.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.status_cond:
+            if self.idle.is_set():
+                return
+            self.idle_waiters.append((loop, future))
+        try:
+            await future
+        finally:
+            if not future.done():
+                with self.status_cond:
+                    if (loop, future) in self.idle_waiters:
+                        self.idle_waiters.remove((loop, future))
+
+    def clear_settings(self):
+        """Discard settings lines nobody collected."""
+        while True:
+            try:
+                self.settings.get_nowait()
+            except queue.Empty:
+                return
+
+    def next_setting(self, timeout: float = None):
+        """Return the next settings line, or None on timeout."""
+        try:
+            return self.settings.get(timeout=timeout)
+        except queue.Empty:
+            return None
@@ -0,0 +1,85 @@
+"""Line transport for serial ports, read on the thread that asks for lines."""
+import asyncio
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# The application's event loop, for scheduling coroutines from worker threads
+_event_loop = None
+
+def set_event_loop(loop):
+    """Remember the application's event loop so worker threads can schedule work on it."""
+    global _event_loop
+    _event_loop = loop
+
+def get_event_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        if _event_loop and _event_loop.is_running():
+            return _event_loop
+    return None
+
+class SerialLineTransport:
+    """
+    Split a serial port's input into lines.
+
+    Reads are blocking pyserial reads made on the thread that asks for a line,
+    in practice the connection's ResponseRouter, so acks keep flowing to the
+    streamer however busy the event loop is.
+    """
+    def __init__(self, ser):
+        self.ser = ser
+        self.write_lock = threading.Lock()
+        self.read_lock = threading.Lock()
+        self.lines_buffer = deque()
+        self.partial = bytearray()
+        self.closed = False
+
+    def close(self):
+        """Stop reading; a blocked read returns once the port is closed or times out."""
+        self.closed = True
+
+    def _feed(self, data):
+        self.partial.extend(data)
+        while True:
+            end = self.partial.find(b"\n")
+            if end < 0:
+                break
+            line = self.partial[:end].decode(errors="replace").strip()
+            del self.partial[:end + 1]
+            if line:
+                self.lines_buffer.append(line)
+
+    def pending(self):
+        """Number of complete lines waiting to be read, or 1 if only the port has data."""
+        if self.lines_buffer:
+            return len(self.lines_buffer)
+        try:
+            return 1 if self.ser.in_waiting else 0
+        except Exception:
+            return 0
+
+    def readline_blocking(self):
+        """Return the next line, or '' if none arrived within the port's read timeout."""
+        with self.read_lock:
+            while not self.lines_buffer and not self.closed:
+                try:
+                    # Blocks for the first byte, then takes whatever else has arrived
+                    data = self.ser.read(self.ser.in_waiting or 1)
+                except Exception as e:
+                    if not self.closed:
+                        logger.error(f"Error reading serial port: {str(e)}")
+                        self.close()
+                    break
+                if not data:
+                    break
+                self._feed(data)
+            return self.lines_buffer.popleft() if self.lines_buffer else ""
+
+    def write_blocking(self, data):
+        with self.write_lock:
+            self.ser.write(data)
+            self.ser.flush()
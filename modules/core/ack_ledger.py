@@ -0,0 +1,109 @@
+"""Map controller acknowledgements and planner status back to pattern point indices."""
+import threading
+import time
+from collections import deque
+
+# Acked moves remembered to look back across the controller's planner buffer
+WINDOW_SIZE = 256
+# Without a status report this recent, the last acked point is used instead
+STALE_STATUS_S = 2.0
+
+class AckLedger:
+    """
+    Know which pattern point the ball has actually reached while moves are
+    pipelined ahead of it.
+
+    Every streamed move is tagged with the index of the point it ends at. An
+    'ok' means the controller has planned the move, not that it has run it, so
+    the ledger keeps the recently acked tags in order. A status report's Bf
+    field tells how many planner blocks are free; the moves still occupying the
+    others have not finished, so the point reached is the tag just before them.
+    Without Bf or recent status reports, the last acked point is used as an
+    upper bound.
+    """
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.lock = threading.Lock()
+        self.acked = deque(maxlen=window_size)
+        self.active = False
+        self.acked_index = 0
+        self.executed_index = 0
+        # Largest free block count seen, i.e. the planner's size
+        self.planner_size = None
+        self.last_status_time = None
+        self.thetas = None
+        self.rhos = None
+
+    def begin(self, thetas, rhos, start_index=0):
+        """Start tracking a pattern whose point `start_index` has been reached."""
+        with self.lock:
+            self.acked.clear()
+            self.thetas = thetas
+            self.rhos = rhos
+            self.acked_index = start_index
+            self.executed_index = start_index
+            self.last_status_time = None
+            self.active = True
+
+    def end(self):
+        """Stop tracking once the pattern has finished moving."""
+        with self.lock:
+            if self.active:
+                self.executed_index = self.acked_index
+            self.active = False
+
+    def abort(self):
+        """Stop tracking after the controller discarded the moves it had queued."""
+        with self.lock:
+            self.active = False
+
+    def record_ack(self, index):
+        """Record that the move ending at point `index` was acknowledged."""
+        with self.lock:
+            if not self.active:
+                return
+            self.acked.append(index)
+            self.acked_index = index
+
+    def record_status(self, report):
+        """Update the executed point from a parsed status report."""
+        free_blocks = report.get("planner_blocks")
+        if free_blocks is not None and (self.planner_size is None or free_blocks > self.planner_size):
+            self.planner_size = free_blocks
+        with self.lock:
+            if not self.active:
+                return
+            self.last_status_time = time.monotonic()
+            if report.get("state") == "Idle":
+                executed = self.acked_index
+            elif free_blocks is not None and self.planner_size:
+                in_use = self.planner_size - free_blocks
+                if in_use <= 0:
+                    executed = self.acked_index
+                elif in_use < len(self.acked):
+                    executed = self.acked[-in_use - 1]
+                else:
+                    # Nothing acked so far has finished
+                    return
+            else:
+                executed = self.acked_index
+            # Status reports can be older than the last ack, never go backwards
+            if executed > self.executed_index:
+                self.executed_index = executed
+
+    def reached_index(self):
+        """Best known index of the point the ball has reached."""
+        if self.last_status_time is None or time.monotonic() - self.last_status_time > STALE_STATUS_S:
+            return self.acked_index
+        return self.executed_index
+
+    def executed_point(self):
+        """Return {index, theta, rho} of the point reached, or None if no pattern is tracked."""
+        with self.lock:
+            if not self.active or self.thetas is None:
+                return None
+            index = self.reached_index()
+            return {"index": index, "theta": self.thetas[index], "rho": self.rhos[index]}
+
+
+# Create a singleton instance that you can import elsewhere:
+ack_ledger = AckLedger()
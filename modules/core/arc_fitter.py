@@ -0,0 +1,101 @@
+"""
+Arc fitting for constant-radius and spiral runs of theta-rho patterns.
+
+The table's X axis is theta and its Y axis is rho plus a fixed coupling to theta,
+so a run where rho changes linearly with theta (a circle when rho is constant,
+an Archimedean spiral otherwise) is a straight line in machine space. A single
+G1 between the ends of such a run makes the controller draw the exact arc, which
+is why this emits G1 moves rather than G2/G3: those interpolate a circle in
+machine space, which is not a circle on the sand.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Largest deviation of rho from the fitted run; .thr files store 3 decimals,
+# so this stays within the rounding already present in the pattern.
+DEFAULT_RHO_TOLERANCE = 0.0005
+
+def _direction_run_ends(thetas):
+    """For each index, the last index reachable while theta keeps moving in one direction."""
+    count = len(thetas)
+    signs = np.sign(np.diff(thetas))
+    ends = np.empty(count, dtype=np.int64)
+    ends[-1] = count - 1
+    if count < 2:
+        return ends
+    # A new run starts wherever the direction changes or theta stalls
+    breaks = np.flatnonzero((signs[1:] != signs[:-1]) | (signs[1:] == 0)) + 1
+    segment_ends = np.append(breaks, count - 1)
+    segment_starts = np.insert(breaks, 0, 0)
+    for start, end in zip(segment_starts, segment_ends):
+        ends[start:end] = end if signs[start] != 0 else start + 1
+    return ends
+
+def _is_arc(thetas, rhos, start, end, tolerance):
+    if end - start < 2:
+        return True
+    span = thetas[end] - thetas[start]
+    slope = (rhos[end] - rhos[start]) / span
+    inner = slice(start + 1, end)
+    fitted = rhos[start] + (thetas[inner] - thetas[start]) * slope
+    return bool(np.max(np.abs(rhos[inner] - fitted)) <= tolerance)
+
+def fit_arcs(thetas, rhos, rho_tolerance=DEFAULT_RHO_TOLERANCE):
+    """
+    Collapse every constant-radius or spiral run into its two end points.
+
+    Returns:
+        Tuple of (sorted numpy array of indices to keep, number of runs collapsed).
+    """
+    thetas = np.asarray(thetas, dtype=np.float64)
+    rhos = np.asarray(rhos, dtype=np.float64)
+    count = len(thetas)
+    if count < 3:
+        return np.arange(count), 0
+
+    run_ends = _direction_run_ends(thetas)
+    kept = [0]
+    runs = 0
+    start = 0
+    while start < count - 1:
+        limit = int(run_ends[start])
+        # Gallop to bracket the longest arc, then binary search inside the bracket
+        good, step = start + 1, 1
+        while good < limit:
+            candidate = min(start + step * 2, limit)
+            if not _is_arc(thetas, rhos, start, candidate, rho_tolerance):
+                break
+            good, step = candidate, step * 2
+        low, high = good, min(start + step * 2, limit)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _is_arc(thetas, rhos, start, middle, rho_tolerance):
+                low = middle
+            else:
+                high = middle - 1
+        end = max(low, start + 1)
+        if end - start > 1:
+            runs += 1
+        kept.append(end)
+        start = end
+    return np.asarray(kept, dtype=np.int64), runs
+
+def fit_coordinates(coordinates, rho_tolerance=DEFAULT_RHO_TOLERANCE):
+    """
+    Arc-fit a list of (theta, rho) pairs and report the reduction.
+
+    Returns:
+        Tuple of (kept indices, stats dict).
+    """
+    thetas, rhos = np.asarray(coordinates, dtype=np.float64).T
+    kept, runs = fit_arcs(thetas, rhos, rho_tolerance)
+    stats = {
+        "arcs": runs,
+        "original_points": len(coordinates),
+        "points_removed": len(coordinates) - len(kept),
+    }
+    logger.info(f"Arc fitting merged {runs} runs, removing {stats['points_removed']}/{len(coordinates)} points")
+    return kept, stats
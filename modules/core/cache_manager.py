@@ -141,6 +141,24 @@ def cache_pattern_metadata(pattern_file, first_coord, last_coord, total_coords):
     except Exception as e:
         logger.warning(f"Failed to cache metadata for {pattern_file}: {str(e)}")
 
+def ensure_pattern_metadata(pattern_file):
+    """Return the cached metadata of a pattern, parsing it once if it isn't cached yet."""
+    metadata = get_pattern_metadata(pattern_file)
+    if metadata is not None:
+        return metadata
+    try:
+        coordinates = parse_theta_rho_file(os.path.join(THETA_RHO_DIR, pattern_file))
+    except Exception as e:
+        logger.warning(f"Failed to parse {pattern_file} for metadata: {str(e)}")
+        return None
+    if not coordinates:
+        return None
+    cache_pattern_metadata(pattern_file,
+                           {"x": coordinates[0][0], "y": coordinates[0][1]},
+                           {"x": coordinates[-1][0], "y": coordinates[-1][1]},
+                           len(coordinates))
+    return get_pattern_metadata(pattern_file)
+
 def needs_cache(pattern_file):
     """Check if a pattern file needs its cache generated."""
     # Check if image preview exists
@@ -0,0 +1,131 @@
+"""Append-only journal of playback checkpoints for resuming an interrupted pattern."""
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = "checkpoint.journal"
+# Seconds between two checkpoints
+CHECKPOINT_INTERVAL_S = 1.0
+# Checkpoints are only forced to disk this often
+FSYNC_INTERVAL_S = 5.0
+
+class CheckpointJournal:
+    """
+    Record how far the running pattern got so it can be resumed after a
+    reboot or a lost connection.
+
+    Every run starts the file over with a header naming the pattern and its
+    compile key, then appends one short line per checkpoint with the executed
+    point index and machine position. Appends go to a file kept open and are
+    only fsynced every FSYNC_INTERVAL_S, so a checkpoint costs far less than
+    rewriting state.json. A crash loses at most the last few seconds of
+    checkpoints and maybe a torn last line, which load() skips. A run that
+    completes or is stopped on purpose is closed with an end record and is not
+    offered for resuming.
+    """
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self.file = None
+        self.last_sync = 0
+        self.next_checkpoint = 0
+        # Checkpoint of the run interrupted before this process started
+        self.resumable = self.load()
+
+    def begin(self, file_path, key, point_count, start_index=0, rotation=0.0, reverse=False):
+        """Start the journal of a new run, rotated by `rotation` radians and maybe reversed."""
+        self.close()
+        self.resumable = None
+        try:
+            self.file = open(self.path, "w")
+            self._append({"type": "start", "file": file_path, "key": key,
+                          "points": point_count, "rotation": rotation, "reverse": reverse, "time": time.time()})
+            self._append({"i": start_index})
+            self._sync()
+        except OSError as e:
+            logger.error(f"Error starting checkpoint journal: {str(e)}")
+            self.file = None
+        self.next_checkpoint = time.monotonic() + CHECKPOINT_INTERVAL_S
+
+    def due(self):
+        """Whether CHECKPOINT_INTERVAL_S passed since the last checkpoint of a journaled run."""
+        return self.file is not None and time.monotonic() >= self.next_checkpoint
+
+    def checkpoint(self, executed_index, machine_x, machine_y):
+        """Journal the executed point. Callers only need to checkpoint when due()."""
+        if not self.file:
+            return
+        self.next_checkpoint = time.monotonic() + CHECKPOINT_INTERVAL_S
+        try:
+            self._append({"i": executed_index, "x": round(machine_x, 3), "y": round(machine_y, 3)})
+            if time.monotonic() - self.last_sync >= FSYNC_INTERVAL_S:
+                self._sync()
+        except OSError as e:
+            logger.error(f"Error writing checkpoint: {str(e)}")
+
+    def finish(self):
+        """Mark the run as done, nothing is left to resume."""
+        if not self.file:
+            return
+        try:
+            self._append({"type": "end"})
+        except OSError as e:
+            logger.error(f"Error finishing checkpoint journal: {str(e)}")
+        self.close()
+
+    def close(self):
+        """Flush the journal to disk, leaving the run resumable."""
+        if not self.file:
+            return
+        try:
+            self._sync()
+            self.file.close()
+        except OSError as e:
+            logger.error(f"Error closing checkpoint journal: {str(e)}")
+        self.file = None
+        self.resumable = self.load()
+
+    def load(self):
+        """
+        Return the last checkpoint of an unfinished run as a dict with file,
+        key, points, rotation, reverse, index, machine_x and machine_y, or None.
+        """
+        if not os.path.exists(self.path):
+            return None
+        checkpoint = None
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write at the end of the file
+                        continue
+                    if record.get("type") == "start":
+                        checkpoint = {"file": record["file"], "key": record["key"], "points": record["points"],
+                                      "rotation": record.get("rotation", 0.0), "reverse": record.get("reverse", False),
+                                      "index": 0, "machine_x": None, "machine_y": None}
+                    elif record.get("type") == "end":
+                        checkpoint = None
+                    elif checkpoint is not None and "i" in record:
+                        checkpoint["index"] = record["i"]
+                        checkpoint["machine_x"] = record.get("x")
+                        checkpoint["machine_y"] = record.get("y")
+        except (OSError, KeyError) as e:
+            logger.error(f"Error reading checkpoint journal: {str(e)}")
+            return None
+        return checkpoint
+
+    def _append(self, record):
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync = time.monotonic()
+
+
+# Create a singleton instance that you can import elsewhere:
+checkpoint_journal = CheckpointJournal()
@@ -0,0 +1,132 @@
+"""Kinematic model of how long the controller takes to run a pattern."""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Used for limits the controller has not reported (GRBL/FluidNC defaults)
+DEFAULT_MAX_RATE = 1000.0  # mm/min
+DEFAULT_ACCELERATION = 10.0  # mm/s^2
+DEFAULT_JUNCTION_DEVIATION = 0.01  # mm
+# Measured/model time ratios outside this range are treated as noise
+MIN_DRIFT, MAX_DRIFT = 0.5, 2.0
+# Model time (s) that must have elapsed before measured drift is trusted
+DRIFT_WARMUP_S = 10.0
+
+def get_limits(state):
+    """Return (max rates mm/min, accelerations mm/s^2, junction deviation mm) of the table."""
+    max_rates = (state.x_max_rate or DEFAULT_MAX_RATE, state.y_max_rate or DEFAULT_MAX_RATE)
+    accelerations = (state.x_acceleration or DEFAULT_ACCELERATION, state.y_acceleration or DEFAULT_ACCELERATION)
+    return max_rates, accelerations, state.junction_deviation or DEFAULT_JUNCTION_DEVIATION
+
+def simulate_segment_times(xs, ys, feeds, max_rates, accelerations, junction_deviation):
+    """
+    Simulate the controller's planner over a machine-space polyline.
+
+    Mirrors what GRBL does: each move is limited by its feed and by the
+    per-axis max rates and accelerations, the speed through each corner by the
+    junction deviation, and a backward then forward pass makes every move
+    reachable from its neighbours before timing it as a trapezoidal profile.
+
+    Args:
+        xs, ys: machine positions (mm), one more than there are moves.
+        feeds: feed rate (mm/min) of every move.
+
+    Returns:
+        Numpy array with the duration (s) of every move.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    dx, dy = np.diff(xs), np.diff(ys)
+    lengths = np.hypot(dx, dy)
+    count = len(lengths)
+    if count == 0:
+        return np.zeros(0)
+
+    moving = lengths > 0
+    safe_lengths = np.where(moving, lengths, 1.0)
+    ux, uy = dx / safe_lengths, dy / safe_lengths
+
+    # Per-move speed and acceleration, limited by whichever axis saturates first
+    with np.errstate(divide='ignore'):
+        axis_speed = np.minimum(max_rates[0] / np.abs(ux), max_rates[1] / np.abs(uy))
+        acceleration = np.minimum(accelerations[0] / np.abs(ux), accelerations[1] / np.abs(uy))
+    speed = np.minimum(np.asarray(feeds, dtype=np.float64), axis_speed) / 60
+    acceleration = np.where(moving, acceleration, max(accelerations))
+    speed_sq = speed ** 2
+
+    # Corner speed from the junction deviation between consecutive moves
+    junction_sq = np.zeros(count + 1)
+    if count > 1:
+        cos_theta = -(ux[:-1] * ux[1:] + uy[:-1] * uy[1:])
+        sin_half = np.sqrt(np.clip((1 - cos_theta) / 2, 0, 1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corner_sq = acceleration[1:] * junction_deviation * sin_half / (1 - sin_half)
+        corner_sq[~np.isfinite(corner_sq)] = np.inf
+        junction_sq[1:-1] = np.minimum(corner_sq, np.minimum(speed_sq[:-1], speed_sq[1:]))
+
+    # Backward pass: every move must be able to slow down for the next junction,
+    # forward pass: and be reachable from the previous one
+    reach = 2 * acceleration * lengths
+    entry_sq = junction_sq
+    for i in range(count - 1, -1, -1):
+        entry_sq[i] = min(entry_sq[i], entry_sq[i + 1] + reach[i])
+    for i in range(count):
+        entry_sq[i + 1] = min(entry_sq[i + 1], entry_sq[i] + reach[i])
+
+    start_sq, end_sq = entry_sq[:-1], entry_sq[1:]
+    # Trapezoid if cruise speed is reached, triangle otherwise
+    peak_sq = np.minimum(speed_sq, (reach + start_sq + end_sq) / 2)
+    peak = np.sqrt(peak_sq)
+    start, end = np.sqrt(start_sq), np.sqrt(end_sq)
+    accel_distance = (peak_sq - start_sq) / (2 * acceleration)
+    decel_distance = (peak_sq - end_sq) / (2 * acceleration)
+    cruise_distance = np.maximum(lengths - accel_distance - decel_distance, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        times = (peak - start) / acceleration + (peak - end) / acceleration + cruise_distance / peak
+    return np.where(moving, np.nan_to_num(times), 0.0)
+
+def estimate_compiled_pattern(compiled, state, speed=None):
+    """
+    Return the cumulative model time (s) at every point of a compiled pattern,
+    starting at 0 for point 0. The last entry is the total duration.
+    """
+    speed = speed or state.speed
+    count = compiled.point_count - 1
+    feeds = np.full(count, float(speed))
+    if compiled.feed_factors is not None:
+        feeds = feeds * compiled.feed_factors
+    max_rates, accelerations, junction_deviation = get_limits(state)
+    times = simulate_segment_times(compiled.rel_x, compiled.rel_y, feeds,
+                                   max_rates, accelerations, junction_deviation)
+    return np.concatenate(([0.0], np.cumsum(times)))
+
+class DurationTracker:
+    """
+    Remaining time of a running pattern: the model's remaining time scaled by
+    how far measured time has drifted from the model so far.
+    """
+    def __init__(self, cumulative_times):
+        self.cumulative_times = cumulative_times
+        self.total = float(cumulative_times[-1]) if len(cumulative_times) else 0.0
+
+    def drift(self, index, elapsed):
+        """Ratio of measured to model time up to point `index`."""
+        model_elapsed = float(self.cumulative_times[index])
+        if model_elapsed < DRIFT_WARMUP_S or elapsed <= 0:
+            return 1.0
+        return min(max(elapsed / model_elapsed, MIN_DRIFT), MAX_DRIFT)
+
+    def remaining(self, index, elapsed):
+        """Estimated seconds left once point `index` is reached after `elapsed` seconds."""
+        index = min(max(index, 0), len(self.cumulative_times) - 1)
+        model_remaining = self.total - float(self.cumulative_times[index])
+        return model_remaining * self.drift(index, elapsed)
+
+    def rescale(self, index, ratio):
+        """Stretch the model from point `index` on by `ratio`, e.g. after a speed change."""
+        index = min(max(index, 0), len(self.cumulative_times) - 1)
+        reached = self.cumulative_times[index]
+        self.cumulative_times[index:] = reached + (self.cumulative_times[index:] - reached) * ratio
+        self.total = float(self.cumulative_times[-1])
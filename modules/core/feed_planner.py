@@ -0,0 +1,85 @@
+"""Per-segment feed rates that keep the ball moving through the sand at a constant speed."""
+import logging
+from math import log
+
+import numpy as np
+
+from modules.core import kinematics
+
+logger = logging.getLogger(__name__)
+
+# Fastest a segment may be sent relative to the selected speed. The controller
+# still clamps every axis to its own max rate ($110/$111).
+MAX_SPEEDUP = 3.0
+# Feed factors are rounded down to powers of this ratio so consecutive segments
+# mostly share a feed rate and F rarely needs to be resent
+FEED_STEP = 1.1
+
+def compute_feed_factors(thetas, rhos, x_steps_per_mm, y_steps_per_mm, gear_ratio, table_type,
+                         max_speedup=MAX_SPEEDUP):
+    """
+    Return, for every segment between consecutive points, how much faster than
+    the selected speed it can be sent while the ball keeps the speed it has
+    when circling the perimeter.
+
+    The selected feed applies to the machine-space length of a move, but the
+    ball covers rho * dtheta on the sand for an angular move, so near the center
+    the same feed barely moves it. Each factor is the segment's machine length
+    per unit of sand travel relative to that of a move along the perimeter,
+    clamped to [1, max_speedup] so no segment ever runs slower than today.
+
+    Returns:
+        Numpy array of len(thetas) - 1 factors.
+    """
+    thetas = np.asarray(thetas, dtype=np.float64)
+    rhos = np.asarray(rhos, dtype=np.float64)
+    if len(thetas) < 2:
+        return np.ones(0)
+
+    x_scaling_factor, _ = kinematics.get_scaling_factors(table_type)
+    coupling = kinematics.get_coupling_ratio(x_steps_per_mm, y_steps_per_mm, gear_ratio, table_type)
+    xs, ys = kinematics.compute_machine_coordinates(
+        thetas, rhos, thetas[0], rhos[0], 0.0, 0.0,
+        x_steps_per_mm, y_steps_per_mm, gear_ratio, table_type
+    )
+    machine_length = np.hypot(np.diff(xs), np.diff(ys))
+
+    # Sand travel in table radii, using the segment's mean radius for the arc
+    d_theta = np.diff(thetas)
+    d_rho = np.diff(rhos)
+    mean_rho = (rhos[1:] + rhos[:-1]) / 2
+    sand_length = np.hypot(mean_rho * d_theta, d_rho)
+
+    # Machine mm per table radius travelled along the perimeter
+    reference = 100 / (2 * np.pi * x_scaling_factor) * np.hypot(1, coupling)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factors = machine_length / (sand_length * reference)
+    # Spinning in place at the center moves no sand at all
+    factors[~np.isfinite(factors)] = max_speedup
+    factors = np.clip(factors, 1.0, max_speedup)
+    return quantize_factors(factors)
+
+def quantize_factors(factors):
+    """Round factors down to the nearest power of FEED_STEP."""
+    steps = np.floor(np.log(factors) / log(FEED_STEP) + 1e-9)
+    return np.power(FEED_STEP, steps)
+
+def compute_feed_factors_from_state(coordinates, state):
+    """Feed factors of a list of (theta, rho) pairs for the connected table."""
+    if len(coordinates) < 2:
+        return np.ones(0)
+    thetas, rhos = np.asarray(coordinates, dtype=np.float64).T
+    return compute_feed_factors(
+        thetas, rhos,
+        state.x_steps_per_mm, state.y_steps_per_mm,
+        state.gear_ratio, state.table_type
+    )
+
+def summarize_factors(factors):
+    """Stats of a pattern's feed factors for the plan report."""
+    if len(factors) == 0:
+        return {"mean_speedup": 1.0, "boosted_segments": 0}
+    return {
+        "mean_speedup": float(np.mean(factors)),
+        "boosted_segments": int(np.count_nonzero(factors > 1.0)),
+    }
@@ -0,0 +1,239 @@
+"""Compile patterns into ready-to-stream G-code cached per pattern and table configuration."""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+from modules.core.pattern_manager import parse_theta_rho_file, THETA_RHO_DIR
+from modules.core import kinematics, path_simplifier, arc_fitter, feed_planner
+from modules.core.state import state
+from modules.connection import gcode_encoder
+
+logger = logging.getLogger(__name__)
+
+COMPILED_DIR = os.path.join(THETA_RHO_DIR, "cached_gcode")
+# Bump whenever the compiled output changes so existing files get recompiled
+COMPILER_VERSION = 3
+
+class CompiledPattern:
+    """
+    A compiled pattern: the file of streamable commands plus the planned point
+    every command moves to.
+
+    Point 0 is reached with an absolute lead-in move from wherever the ball is.
+    Command i in the file is an incremental (G91) move from planned point i to
+    planned point i + 1, so the file does not depend on the start position.
+    Its feed rate is the selected speed times feed_factors[i], or just the
+    selected speed when feed_factors is None. A reversed pattern is compiled
+    from its points in reverse order, so point 0 is the pattern's last point.
+    """
+    # Compile key the pattern was loaded under, see get_compile_key
+    key = None
+    reverse = False
+
+    def __init__(self, gcode_path, thetas, rhos, rel_x, rel_y, source_indices, stats, feed_factors=None):
+        self.gcode_path = gcode_path
+        self.thetas = thetas
+        self.rhos = rhos
+        self.rel_x = rel_x
+        self.rel_y = rel_y
+        self.source_indices = source_indices
+        self.stats = stats
+        self.feed_factors = feed_factors
+
+    @property
+    def point_count(self):
+        return len(self.thetas)
+
+    def commands(self):
+        """Yield the incremental commands in streaming order."""
+        with open(self.gcode_path, "r") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+class InMemoryCompiledPattern(CompiledPattern):
+    """A compiled pattern whose commands could not be written to the cache."""
+    def __init__(self, command_list, *args):
+        super().__init__(None, *args)
+        self.command_list = command_list
+
+    def commands(self):
+        return iter(self.command_list)
+
+def plan_coordinates(coordinates):
+    """
+    Apply the optional pre-streaming stages to a parsed pattern.
+
+    Returns:
+        Tuple of (planned coordinates, index of each planned point in the
+        original pattern, stats of every stage that ran).
+    """
+    stats = {}
+    source_indices = np.arange(len(coordinates))
+    if len(coordinates) < 3 or not state.y_steps_per_mm:
+        return coordinates, source_indices, stats
+
+    if state.arc_fitting.get(state.table_type, False):
+        kept, stats['arc_fitting'] = arc_fitter.fit_coordinates(coordinates)
+        coordinates = [coordinates[i] for i in kept]
+        source_indices = source_indices[kept]
+
+    if state.simplify_tolerance > 0:
+        xs, ys = kinematics.compute_relative_machine_coordinates(coordinates, state)
+        kept, stats['simplification'] = path_simplifier.simplify_coordinates(xs, ys, state.simplify_tolerance, state.speed)
+        coordinates = [coordinates[i] for i in kept]
+        source_indices = source_indices[kept]
+    return coordinates, source_indices, stats
+
+def get_compile_key(pattern_hash, reverse=False):
+    """Hash everything the compiled output depends on."""
+    config = {
+        "version": COMPILER_VERSION,
+        "pattern": pattern_hash,
+        "x_steps_per_mm": state.x_steps_per_mm,
+        "y_steps_per_mm": state.y_steps_per_mm,
+        "gear_ratio": state.gear_ratio,
+        "table_type": state.table_type,
+        "arc_fitting": state.arc_fitting.get(state.table_type, False),
+        "simplify_tolerance": state.simplify_tolerance,
+        "dynamic_feed": state.dynamic_feed,
+    }
+    if reverse:
+        config["reverse"] = True
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+def get_compiled_paths(file_path, key, reverse=False):
+    """Return the (gcode, data) paths of a compiled pattern."""
+    # Each direction has its own id so neither counts as a stale compilation of the other
+    pattern_id = hashlib.sha1((os.path.normpath(file_path) + ("|reverse" if reverse else "")).encode()).hexdigest()[:12]
+    base_name = os.path.join(COMPILED_DIR, f"{pattern_id}-{key[:16]}")
+    return f"{base_name}.gcode", f"{base_name}.npz"
+
+def remove_stale_compilations(file_path, key, reverse=False):
+    """Delete compiled files of this pattern made for another configuration or version."""
+    current = [os.path.basename(path) for path in get_compiled_paths(file_path, key, reverse)]
+    pattern_id = current[0].split("-")[0]
+    for path in Path(COMPILED_DIR).glob(f"{pattern_id}-*"):
+        if path.name not in current:
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.debug(f"Could not remove stale compiled file {path}: {str(e)}")
+
+def encode_commands(rel_x, rel_y):
+    """
+    Encode the incremental moves between consecutive planned points at the
+    resolution of each axis.
+
+    Returns:
+        Tuple of (list of commands, encoding stats dict).
+    """
+    x_decimals = gcode_encoder.get_decimals(state.x_steps_per_mm)
+    y_decimals = gcode_encoder.get_decimals(state.y_steps_per_mm)
+    units_x = np.rint(np.asarray(rel_x) * 10 ** x_decimals).astype(np.int64)
+    units_y = np.rint(np.asarray(rel_y) * 10 ** y_decimals).astype(np.int64)
+    # Deltas between rounded positions add up exactly to every rounded position
+    deltas_x = np.diff(units_x).tolist()
+    deltas_y = np.diff(units_y).tolist()
+    commands = gcode_encoder.encode_incremental_moves(deltas_x, deltas_y, x_decimals, y_decimals)
+
+    # What the same moves cost with explicit words, spaces and fixed 3 decimals
+    verbose_bytes = sum(
+        len(f"G1 X{dx / 10 ** x_decimals:.3f} Y{dy / 10 ** y_decimals:.3f}\n")
+        for dx, dy in zip(deltas_x, deltas_y)
+    )
+    stats = {
+        "x_decimals": x_decimals,
+        "y_decimals": y_decimals,
+        "bytes": sum(len(command) + 1 for command in commands),
+        "verbose_bytes": verbose_bytes,
+    }
+    return commands, stats
+
+def load_compiled_pattern(file_path, reverse=False, cache=True):
+    """
+    Return the compiled form of a pattern, played backwards if reverse,
+    compiling and caching it if the pattern or the table configuration changed
+    since it was last compiled. Without cache, e.g. for estimates, a pattern
+    that needs compiling is compiled in memory only. Returns None if the
+    pattern has no coordinates or cannot be read.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            pattern_hash = hashlib.sha1(f.read()).hexdigest()
+    except OSError as e:
+        logger.error(f"Error reading pattern {file_path}: {str(e)}")
+        return None
+    key = get_compile_key(pattern_hash, reverse)
+    gcode_path, data_path = get_compiled_paths(file_path, key, reverse)
+
+    if os.path.exists(gcode_path) and os.path.exists(data_path):
+        try:
+            with np.load(data_path) as data:
+                logger.debug(f"Using compiled G-code for {file_path}")
+                compiled = CompiledPattern(
+                    gcode_path,
+                    data["thetas"], data["rhos"],
+                    data["rel_x"], data["rel_y"],
+                    data["source_indices"],
+                    json.loads(str(data["stats"])),
+                    data["feed_factors"] if "feed_factors" in data.files else None
+                )
+                compiled.key = key
+                compiled.reverse = reverse
+                return compiled
+        except Exception as e:
+            logger.warning(f"Failed to load compiled G-code for {file_path}, recompiling: {str(e)}")
+
+    compiled = compile_pattern(file_path, key, reverse, cache)
+    if compiled:
+        compiled.key = key
+        compiled.reverse = reverse
+    return compiled
+
+def compile_pattern(file_path, key, reverse=False, cache=True):
+    """Plan and encode a pattern, then write it to the compiled cache unless cache is False."""
+    coordinates = parse_theta_rho_file(file_path)
+    if not coordinates:
+        return None
+    if reverse:
+        coordinates = coordinates[::-1]
+
+    coordinates, source_indices, stats = plan_coordinates(coordinates)
+    thetas, rhos = np.asarray(coordinates, dtype=np.float64).T
+    rel_x, rel_y = kinematics.compute_relative_machine_coordinates(coordinates, state)
+    commands, stats['encoding'] = encode_commands(rel_x, rel_y)
+    feed_factors = None
+    if state.dynamic_feed and state.y_steps_per_mm:
+        feed_factors = feed_planner.compute_feed_factors_from_state(coordinates, state)
+        stats['dynamic_feed'] = feed_planner.summarize_factors(feed_factors)
+    if not cache:
+        return InMemoryCompiledPattern(commands, thetas, rhos, rel_x, rel_y, source_indices, stats, feed_factors)
+
+    gcode_path, data_path = get_compiled_paths(file_path, key, reverse)
+    try:
+        Path(COMPILED_DIR).mkdir(parents=True, exist_ok=True)
+        # Write to temporary files first so a crash never leaves a half-written cache entry
+        with open(gcode_path + ".tmp", "w") as f:
+            f.write("\n".join(commands))
+            if commands:
+                f.write("\n")
+        with open(data_path + ".tmp", "wb") as f:
+            arrays = dict(thetas=thetas, rhos=rhos, rel_x=rel_x, rel_y=rel_y,
+                          source_indices=source_indices, stats=json.dumps(stats))
+            if feed_factors is not None:
+                arrays["feed_factors"] = feed_factors
+            np.savez(f, **arrays)
+        os.replace(gcode_path + ".tmp", gcode_path)
+        os.replace(data_path + ".tmp", data_path)
+        remove_stale_compilations(file_path, key, reverse)
+        logger.info(f"Compiled {file_path}: {len(commands)} commands")
+    except Exception as e:
+        logger.error(f"Failed to cache compiled G-code for {file_path}: {str(e)}")
+        # Stream straight from memory if the cache can't be written
+        return InMemoryCompiledPattern(commands, thetas, rhos, rel_x, rel_y, source_indices, stats, feed_factors)
+
+    return CompiledPattern(gcode_path, thetas, rhos, rel_x, rel_y, source_indices, stats, feed_factors)
@@ -0,0 +1,122 @@
+"""Vectorized conversion of theta-rho coordinates into absolute machine coordinates."""
+from math import pi
+
+import numpy as np
+
+def get_scaling_factors(table_type):
+    """
+    Return the (x, y) scaling factors for a table type.
+
+    The steps_per_mm of both axes are scaled so they move at roughly the same speed:
+    X axis (angular): 50mm = 1 revolution
+    Y axis (radial): 0 => 20mm = rho 0 (center) => 1 (perimeter)
+    """
+    if table_type == 'dune_weaver_mini':
+        return 2, 3.7
+    return 2, 5
+
+def get_coupling_ratio(x_steps_per_mm, y_steps_per_mm, gear_ratio, table_type):
+    """
+    Return the Y travel (mm) needed per mm of X travel to cancel the angular axis
+    dragging the radial axis along through the gears.
+    """
+    x_scaling_factor, y_scaling_factor = get_scaling_factors(table_type)
+    x_total_steps = x_steps_per_mm * (100 / x_scaling_factor)
+    y_total_steps = y_steps_per_mm * (100 / y_scaling_factor)
+    ratio = x_total_steps * x_scaling_factor / (gear_ratio * y_total_steps * y_scaling_factor)
+    # The mini's radial axis is coupled in the opposite direction
+    return -ratio if table_type == 'dune_weaver_mini' else ratio
+
+def polar_travel(theta_a, rho_a, theta_b, rho_b, table_type, any_angle=False):
+    """
+    Return the axis travel (mm) of a move between two polar points, going the
+    short way round. Both axes move at roughly the same speed, so the longer
+    travel sets how long the move takes. With any_angle the angle is ignored,
+    for patterns rotated to start wherever the ball is. Accepts numpy arrays
+    that broadcast together as well as scalars.
+    """
+    x_scaling_factor, y_scaling_factor = get_scaling_factors(table_type)
+    turn = np.where(any_angle, 0.0, np.abs((np.subtract(theta_b, theta_a) + pi) % (2 * pi) - pi))
+    return np.maximum(turn * 100 / (2 * pi * x_scaling_factor), np.abs(np.subtract(rho_b, rho_a)) * 100 / y_scaling_factor)
+
+def compute_machine_coordinates(thetas, rhos, start_theta, start_rho, start_x, start_y,
+                                x_steps_per_mm, y_steps_per_mm, gear_ratio, table_type):
+    """
+    Convert arrays of theta/rho into absolute machine X/Y in a single pass.
+
+    Every per-point increment is linear in the change of theta and rho, so the
+    increments telescope and each absolute position follows directly from the
+    start position instead of accumulating point by point.
+
+    Returns:
+        Tuple of numpy arrays (machine_x, machine_y), one entry per input point.
+    """
+    thetas = np.asarray(thetas, dtype=np.float64)
+    rhos = np.asarray(rhos, dtype=np.float64)
+    x_scaling_factor, y_scaling_factor = get_scaling_factors(table_type)
+    coupling = get_coupling_ratio(x_steps_per_mm, y_steps_per_mm, gear_ratio, table_type)
+
+    x_travel = (thetas - start_theta) * 100 / (2 * pi * x_scaling_factor)
+    y_travel = (rhos - start_rho) * 100 / y_scaling_factor + x_travel * coupling
+    return start_x + x_travel, start_y + y_travel
+
+def compute_machine_coordinates_from_state(coordinates, state):
+    """Convert a list of (theta, rho) pairs starting from the table's current position."""
+    if not coordinates:
+        return np.empty(0), np.empty(0)
+    thetas, rhos = np.asarray(coordinates, dtype=np.float64).T
+    return compute_machine_coordinates(
+        thetas, rhos,
+        state.current_theta, state.current_rho,
+        state.machine_x, state.machine_y,
+        state.x_steps_per_mm, state.y_steps_per_mm,
+        state.gear_ratio, state.table_type
+    )
+
+def compute_relative_machine_coordinates(coordinates, state):
+    """
+    Convert a list of (theta, rho) pairs into machine coordinates relative to the
+    pattern's first point, for stages that only care about the shape of the path.
+    """
+    if not coordinates:
+        return np.empty(0), np.empty(0)
+    thetas, rhos = np.asarray(coordinates, dtype=np.float64).T
+    return compute_machine_coordinates(
+        thetas, rhos,
+        thetas[0], rhos[0],
+        0.0, 0.0,
+        state.x_steps_per_mm, state.y_steps_per_mm,
+        state.gear_ratio, state.table_type
+    )
+
+def compute_polar_coordinates(machine_x, machine_y, ref_theta, ref_rho, ref_x, ref_y,
+                              x_steps_per_mm, y_steps_per_mm, gear_ratio, table_type):
+    """
+    Convert machine X/Y back into theta/rho, the inverse of compute_machine_coordinates.
+
+    Machine coordinates only determine theta/rho relative to a known pair, so
+    the reference (ref_theta, ref_rho) must be where the machine was at
+    (ref_x, ref_y).
+
+    Returns:
+        Tuple (theta, rho), scalars or numpy arrays matching the input.
+    """
+    x_scaling_factor, y_scaling_factor = get_scaling_factors(table_type)
+    coupling = get_coupling_ratio(x_steps_per_mm, y_steps_per_mm, gear_ratio, table_type)
+
+    x_travel = np.asarray(machine_x, dtype=np.float64) - ref_x
+    y_travel = np.asarray(machine_y, dtype=np.float64) - ref_y
+    theta = ref_theta + x_travel * (2 * pi * x_scaling_factor) / 100
+    rho = ref_rho + (y_travel - x_travel * coupling) * y_scaling_factor / 100
+    return theta, rho
+
+def compute_polar_coordinates_from_state(machine_x, machine_y, state):
+    """Convert machine X/Y into theta/rho using the table's last known position as reference."""
+    theta, rho = compute_polar_coordinates(
+        machine_x, machine_y,
+        state.current_theta, state.current_rho,
+        state.machine_x, state.machine_y,
+        state.x_steps_per_mm, state.y_steps_per_mm,
+        state.gear_ratio, state.table_type
+    )
+    return float(theta), float(rho)
@@ -0,0 +1,108 @@
+"""Motion executor that keeps blocking controller I/O off the asyncio event loop."""
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+
+from modules.core.state import state
+
+logger = logging.getLogger(__name__)
+
+class MotionExecutor:
+    """
+    Run motion work on a dedicated thread that takes jobs from a queue.
+
+    Serial I/O blocks, so pattern playback and one-off moves are submitted here
+    and awaited from the event loop instead of running on it. Pause, resume,
+    stop, skip and speed changes only touch thread-safe primitives, so they can
+    be called from FastAPI handlers, MQTT callbacks or a running job alike.
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Set while playback may proceed, cleared while paused
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+
+    def start(self):
+        """Start the executor thread if it is not already running."""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="motion-executor", daemon=True)
+            self._thread.start()
+            logger.info("Motion executor started")
+
+    def shutdown(self, timeout=5):
+        """Stop the executor thread once the jobs already queued have finished."""
+        if not self._thread or not self._thread.is_alive():
+            return
+        self.stop()
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            logger.warning("Motion executor did not terminate cleanly")
+        self._thread = None
+
+    def submit(self, fn, *args, **kwargs) -> concurrent.futures.Future:
+        """Queue fn(*args, **kwargs) for the executor thread and return its future."""
+        self.start()
+        future = concurrent.futures.Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn on the executor thread and await its result from the event loop."""
+        if self.is_executor_thread():
+            return fn(*args, **kwargs)
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def is_executor_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            future, fn, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                logger.error(f"Motion job {getattr(fn, '__name__', fn)} failed: {e}")
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def pause(self):
+        state.pause_requested = True
+        self.resume_event.clear()
+
+    def resume(self):
+        state.pause_requested = False
+        self.resume_event.set()
+
+    def stop(self):
+        state.stop_requested = True
+        state.pause_requested = False
+        # Wake a paused job so it can observe the stop
+        self.resume_event.set()
+
+    def skip(self):
+        state.skip_requested = True
+        self.resume_event.set()
+
+    def set_speed(self, speed):
+        state.speed = speed
+
+    def wait_if_paused(self):
+        """Block the calling job while playback is paused."""
+        self.resume_event.wait()
+
+
+# Create a singleton instance that you can import elsewhere:
+motion_executor = MotionExecutor()
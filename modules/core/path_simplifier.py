@@ -0,0 +1,86 @@
+"""Tolerance-based simplification of patterns in machine space."""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rough host/controller cost of each command on top of its travel time, in seconds
+COMMAND_OVERHEAD_S = 0.005
+
+def simplify_path(xs, ys, tolerance):
+    """
+    Ramer-Douglas-Peucker simplification of a machine-space polyline.
+
+    The controller interpolates linearly between consecutive machine positions,
+    so any point closer than `tolerance` mm to the segment joining its kept
+    neighbours would be drawn in (almost) the same place without it.
+
+    Returns:
+        Sorted numpy array of the indices of the points to keep. The first and
+        last points are always kept.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    count = len(xs)
+    if count < 3 or tolerance <= 0:
+        return np.arange(count)
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    # Iterative to avoid hitting the recursion limit on 100k point patterns
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        seg_x = xs[end] - xs[start]
+        seg_y = ys[end] - ys[start]
+        seg_len_sq = seg_x * seg_x + seg_y * seg_y
+        px = xs[start + 1:end] - xs[start]
+        py = ys[start + 1:end] - ys[start]
+        if seg_len_sq == 0:
+            distances = np.hypot(px, py)
+        else:
+            # Distance to the segment, not the line through it, so a stroke that
+            # runs out and back along the chord still counts as deviating
+            t = np.clip((px * seg_x + py * seg_y) / seg_len_sq, 0.0, 1.0)
+            distances = np.hypot(px - t * seg_x, py - t * seg_y)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+def estimate_path_time(xs, ys, feed_rate):
+    """Estimate streaming time (s) for a machine-space polyline at a feed rate in mm/min."""
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if len(xs) < 2 or feed_rate <= 0:
+        return 0.0
+    length = float(np.hypot(np.diff(xs), np.diff(ys)).sum())
+    return length / (feed_rate / 60) + (len(xs) - 1) * COMMAND_OVERHEAD_S
+
+def simplify_coordinates(xs, ys, tolerance, feed_rate):
+    """
+    Simplify a pattern given its machine coordinates and report what it saved.
+
+    Returns:
+        Tuple of (kept indices, stats dict with points removed and seconds saved).
+    """
+    kept = simplify_path(xs, ys, tolerance)
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    original_time = estimate_path_time(xs, ys, feed_rate)
+    simplified_time = estimate_path_time(xs[kept], ys[kept], feed_rate)
+    stats = {
+        "tolerance_mm": tolerance,
+        "original_points": len(xs),
+        "points_removed": len(xs) - len(kept),
+        "estimated_time_saved": max(original_time - simplified_time, 0.0),
+    }
+    logger.info(f"Path simplification removed {stats['points_removed']}/{len(xs)} points "
+                f"at {tolerance}mm, saving ~{stats['estimated_time_saved']:.1f}s")
+    return kept, stats
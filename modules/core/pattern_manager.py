@@ -4,12 +4,19 @@ import time
 import random
 import logging
 from datetime import datetime
-from tqdm import tqdm
 from modules.connection import connection_manager
+from modules.connection.connection_supervisor import connection_supervisor
 from modules.core.state import state
+from modules.core.motion_executor import motion_executor
+from modules.core.progress_tracker import ProgressTracker, PUBLISH_INTERVAL_S
+from modules.core.ack_ledger import ack_ledger
+from modules.core.checkpoint_journal import checkpoint_journal
+from modules.core import kinematics, feed_planner, duration_model
 from math import pi
 import asyncio
+import itertools
 import json
+import numpy as np
 from modules.led.led_controller import effect_playing, effect_idle
 
 # Configure logging
@@ -18,10 +25,8 @@ logger = logging.getLogger(__name__)
 # Global state
 THETA_RHO_DIR = './patterns'
 os.makedirs(THETA_RHO_DIR, exist_ok=True)
-
-# Create an asyncio Event for pause/resume
-pause_event = asyncio.Event()
-pause_event.set()  # Initially not paused
+# Generated transition paths, not listed as patterns
+TRANSITION_DIR = os.path.join(THETA_RHO_DIR, "cached_transitions")
 
 # Create an asyncio Lock for pattern execution
 pattern_lock = asyncio.Lock()
@@ -29,9 +34,17 @@ pattern_lock = asyncio.Lock()
 # Progress update task
 progress_update_task = None
 
+# Keeps state.speed and the controller's feed override consistent for the motion loop
+speed_lock = threading.Lock()
+
+# Points after a checkpoint searched for the one the ball stopped on
+RESUME_SEARCH_POINTS = 512
+# Furthest (mm) the ball may be from that point to resume without homing
+RESUME_TOLERANCE_MM = 0.5
+
 async def cleanup_pattern_manager():
     """Clean up pattern manager resources"""
-    global progress_update_task, pattern_lock, pause_event
+    global progress_update_task, pattern_lock
     
     try:
         # Cancel progress update task if running
@@ -55,13 +68,8 @@ async def cleanup_pattern_manager():
             except Exception as e:
                 logger.error(f"Error cleaning up pattern lock: {e}")
         
-        # Clean up pause event
-        if pause_event:
-            try:
-                pause_event.set()  # Wake up any waiting tasks
-                pause_event = None
-            except Exception as e:
-                logger.error(f"Error cleaning up pause event: {e}")
+        # Wake up a paused motion job so it can exit
+        motion_executor.stop()
         
         # Clean up pause condition from state
         if state.pause_condition:
@@ -91,11 +99,12 @@ async def cleanup_pattern_manager():
         # Ensure we always reset these
         progress_update_task = None
         pattern_lock = None
-        pause_event = None
 
 def list_theta_rho_files():
     files = []
     for root, _, filenames in os.walk(THETA_RHO_DIR):
+        if os.path.normpath(root).startswith(os.path.normpath(TRANSITION_DIR)):
+            continue
         for file in filenames:
             relative_path = os.path.relpath(os.path.join(root, file), THETA_RHO_DIR)
             # Normalize path separators to always use forward slashes for consistency across platforms
@@ -127,8 +136,12 @@ def parse_theta_rho_file(file_path):
         logger.debug(f"Parsed {len(coordinates)} coordinates from {file_path}")
     return coordinates
 
-def get_clear_pattern_file(clear_pattern_mode, path=None):
-    """Return a .thr file path based on pattern_name and table type."""
+def get_clear_pattern_file(clear_pattern_mode, path=None, first_rho=None):
+    """
+    Return a .thr file path based on pattern_name and table type. In adaptive
+    mode the choice depends on where the next pattern starts, `first_rho` or
+    else the first point cached in its metadata.
+    """
     if not clear_pattern_mode or clear_pattern_mode == 'none':
         return
     
@@ -162,16 +175,18 @@ def get_clear_pattern_file(clear_pattern_mode, path=None):
         return random.choice(list(table_patterns.values()))
 
     if clear_pattern_mode == 'adaptive':
-        if not path:
-            logger.warning("No path provided for adaptive clear pattern")
-            return random.choice(list(table_patterns.values()))
-            
-        coordinates = parse_theta_rho_file(path)
-        if not coordinates:
-            logger.warning("No valid coordinates found in file for adaptive clear pattern")
-            return random.choice(list(table_patterns.values()))
-            
-        first_rho = coordinates[0][1]
+        if first_rho is None:
+            if not path:
+                logger.warning("No path provided for adaptive clear pattern")
+                return random.choice(list(table_patterns.values()))
+
+            from modules.core.cache_manager import ensure_pattern_metadata
+            metadata = ensure_pattern_metadata(get_metadata_name(path))
+            if not metadata or not metadata.get('first_coordinate'):
+                logger.warning("No valid coordinates found in file for adaptive clear pattern")
+                return random.choice(list(table_patterns.values()))
+            first_rho = metadata['first_coordinate']['y']
+
         if first_rho < 0.5:
             return table_patterns['clear_from_out']
         else:
@@ -194,13 +209,19 @@ def is_clear_pattern(file_path):
     
     # Normalize paths for comparison
     normalized_path = os.path.normpath(file_path)
+    # Generated transitions stand in for clear patterns
+    if os.path.dirname(normalized_path) == os.path.normpath(TRANSITION_DIR):
+        return True
     normalized_clear_patterns = [os.path.normpath(p) for p in clear_patterns]
     
     # Check if the file path matches any clear pattern path
     return normalized_path in normalized_clear_patterns
 
-async def run_theta_rho_file(file_path, is_playlist=False):
-    """Run a theta-rho file by sending data in optimized batches with tqdm ETA tracking."""
+async def run_theta_rho_file(file_path, is_playlist=False, checkpoint=None):
+    """
+    Run a theta-rho file by sending data in optimized batches with model-based ETA tracking.
+    With a checkpoint from the journal, playback continues from its point.
+    """
     if pattern_lock.locked():
         logger.warning("Another pattern is already running. Cannot start a new one.")
         return
@@ -211,8 +232,10 @@ async def run_theta_rho_file(file_path, is_playlist=False):
         if not is_playlist and not progress_update_task:
             progress_update_task = asyncio.create_task(broadcast_progress())
         
-        coordinates = parse_theta_rho_file(file_path)
-        total_coordinates = len(coordinates)
+        reverse = checkpoint.get("reverse", False) if checkpoint else choose_reverse(file_path)
+        from modules.core.gcode_compiler import load_compiled_pattern
+        compiled = await asyncio.to_thread(load_compiled_pattern, file_path, reverse)
+        total_coordinates = compiled.point_count if compiled else 0
 
         if total_coordinates < 2:
             logger.warning("Not enough coordinates for interpolation")
@@ -221,76 +244,55 @@ async def run_theta_rho_file(file_path, is_playlist=False):
                 state.execution_progress = None
             return
 
-        state.execution_progress = (0, total_coordinates, None, 0)
+        start_index = 0
+        # A resumed run keeps the rotation it started with, a new one picks its own
+        rotation = None
+        if checkpoint:
+            if compiled.key != checkpoint["key"]:
+                logger.error(f"{file_path} or the table configuration changed since the checkpoint, cannot resume")
+                return
+            start_index = min(checkpoint["index"], total_coordinates - 1)
+            rotation = checkpoint.get("rotation", 0.0)
+
+        cumulative_times = await asyncio.to_thread(duration_model.estimate_compiled_pattern, compiled, state)
+        tracker = duration_model.DurationTracker(cumulative_times)
+        state.execution_progress = (0, total_coordinates, tracker.total, 0)
+        state.plan_stats = compiled.stats
+        state.plan_stats['estimated_duration'] = tracker.total
+        logger.info(f"Estimated duration of {file_path}: {tracker.total:.0f}s")
         
         # stop actions without resetting the playlist
-        stop_actions(clear_playlist=False)
+        stop_actions(clear_playlist=False, halt=False)
 
         state.current_playing_file = file_path
         state.stop_requested = False
         logger.info(f"Starting pattern execution: {file_path}")
         logger.info(f"t: {state.current_theta}, r: {state.current_rho}")
-        reset_theta()
         
-        start_time = time.time()
-        if state.led_controller:
-            effect_playing(state.led_controller)
-            
-        with tqdm(
-            total=total_coordinates,
-            unit="coords",
-            desc=f"Executing Pattern {file_path}",
-            dynamic_ncols=True,
-            disable=False,
-            mininterval=1.0
-        ) as pbar:
-            for i, coordinate in enumerate(coordinates):
-                theta, rho = coordinate
-                if state.stop_requested:
-                    logger.info("Execution stopped by user")
-                    if state.led_controller:
-                        effect_idle(state.led_controller)
-                    break
-                
-                if state.skip_requested:
-                    logger.info("Skipping pattern...")
-                    connection_manager.check_idle()
-                    if state.led_controller:
-                        effect_idle(state.led_controller)
-                    break
+        # A resumed pattern is timed as if it had run up to its start point
+        start_time = time.time() - float(cumulative_times[start_index])
+        progress = ProgressTracker(state, total_coordinates, start_time, tracker,
+                                   description=f"Executing Pattern {file_path}", ledger=ack_ledger)
+        try:
+            # The motion loop blocks on serial I/O, so it runs on the motion executor
+            base = await motion_executor.run(_execute_compiled_pattern, file_path, compiled, tracker, progress,
+                                             start_index, rotation)
 
-                # Wait for resume if paused
-                if state.pause_requested:
-                    logger.info("Execution paused...")
-                    if state.led_controller:
-                        effect_idle(state.led_controller)
-                    await pause_event.wait()
-                    logger.info("Execution resumed...")
-                    if state.led_controller:
-                        effect_playing(state.led_controller)
+            if not state.conn:
+                logger.error("Device is not connected. Stopping pattern execution.")
+                return
 
-                move_polar(theta, rho)
-                
-                # Update progress for all coordinates including the first one
-                pbar.update(1)
-                elapsed_time = time.time() - start_time
-                estimated_remaining_time = (total_coordinates - (i + 1)) / pbar.format_dict['rate'] if pbar.format_dict['rate'] and total_coordinates else 0
-                state.execution_progress = (i + 1, total_coordinates, estimated_remaining_time, elapsed_time)
-                
-                # Add a small delay to allow other async operations
-                await asyncio.sleep(0.001)
-
-        # Update progress one last time to show 100%
-        elapsed_time = time.time() - start_time
-        state.execution_progress = (total_coordinates, total_coordinates, 0, elapsed_time)
-        # Give WebSocket a chance to send the final update
-        await asyncio.sleep(0.1)
-        
-        if not state.conn:
-            logger.error("Device is not connected. Stopping pattern execution.")
-            return
-            
-        connection_manager.check_idle()
+            drained = await _drain_pattern(compiled, progress, base)
+            if drained and not state.stop_requested:
+                progress.finish()
+                # Give WebSocket a chance to send the final update
+                await asyncio.sleep(0.1)
+        finally:
+            progress.close()
+        await motion_executor.run(connection_manager.update_machine_position)
+        ack_ledger.end()
+        # Moves outside patterns are streamed at state.speed itself
+        connection_manager.reset_feed_override()
         
         # Set LED back to idle when pattern completes normally (not stopped early)
         if state.led_controller and not state.stop_requested:
@@ -315,8 +317,421 @@ async def run_theta_rho_file(file_path, is_playlist=False):
             progress_update_task = None
             
 
-async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_mode="single", shuffle=False):
-    """Run multiple .thr files in sequence with options."""
+def estimate_pattern_duration(file_path, cache=True):
+    """
+    Return the modelled run time (s) of a pattern at the current speed, or
+    None if it is empty. Without cache, nothing is written to the compiled cache.
+    """
+    from modules.core.gcode_compiler import load_compiled_pattern
+    compiled = load_compiled_pattern(file_path, cache=cache)
+    if not compiled or compiled.point_count < 2:
+        return None
+    return float(duration_model.estimate_compiled_pattern(compiled, state)[-1])
+
+def get_metadata_name(file_path):
+    """Name a pattern is cached under in the metadata cache."""
+    return os.path.relpath(file_path, THETA_RHO_DIR)
+
+def is_rotation_safe(file_path):
+    """Whether a pattern is marked as looking the same when rotated, so it may start at any angle."""
+    return get_metadata_name(file_path) in state.rotation_safe_patterns
+
+def set_rotation_safe(file_path, rotation_safe):
+    """Mark a pattern as rotation-safe or not. The marks are kept in the saved state."""
+    name = get_metadata_name(file_path)
+    if rotation_safe:
+        state.rotation_safe_patterns.add(name)
+    else:
+        state.rotation_safe_patterns.discard(name)
+    state.save()
+    logger.info(f"{name} marked as {'rotation-safe' if rotation_safe else 'not rotation-safe'}")
+
+def get_start_rotation(file_path, first_theta):
+    """
+    Return the theta offset (radians) that makes a pattern start at the ball's
+    current angle. Theta only adds to X and the coupled Y travel, so the
+    compiled relative moves stay the same and only the lead-in changes.
+
+    Unless start rotation is enabled and the pattern is marked rotation-safe,
+    the offset is a whole number of turns, which leaves the pattern as it is
+    and only makes the lead-in go the short way round.
+    """
+    if state.start_rotation:
+        if is_rotation_safe(file_path):
+            return state.current_theta % (2 * pi) - first_theta
+    return -round((first_theta - state.current_theta) / (2 * pi)) * 2 * pi
+
+def choose_reverse(file_path):
+    """
+    Whether to play a pattern backwards because its last point is closer to
+    the ball than its first. Only the cached metadata is read, a pattern
+    without it is played forwards.
+    """
+    if not state.auto_reverse:
+        return False
+    from modules.core.cache_manager import get_pattern_metadata
+    metadata = get_pattern_metadata(get_metadata_name(file_path))
+    saved = get_reverse_saving((state.current_theta, state.current_rho), metadata, is_rotation_safe(file_path))
+    if saved > 0:
+        logger.info(f"Playing {file_path} in reverse, {saved:.1f}mm less lead-in")
+        return True
+    return False
+
+def get_reverse_saving(position, metadata, rotation_safe=False):
+    """
+    Lead-in travel (mm) saved from the (theta, rho) position by playing the
+    pattern described by `metadata` backwards, negative if that is longer.
+    """
+    if not metadata or not metadata.get('first_coordinate') or not metadata.get('last_coordinate'):
+        return 0.0
+    any_angle = bool(state.start_rotation and rotation_safe)
+    first, last = metadata['first_coordinate'], metadata['last_coordinate']
+    forward = kinematics.polar_travel(position[0], position[1], first['x'], first['y'], state.table_type, any_angle)
+    backward = kinematics.polar_travel(position[0], position[1], last['x'], last['y'], state.table_type, any_angle)
+    return float(forward - backward)
+
+async def _drain_pattern(compiled, progress, base):
+    """
+    Wait for the controller to run the moves still queued after the last one
+    was sent, publishing progress and checkpoints from the ack ledger
+    meanwhile. `base` is the machine position of the pattern's origin, or
+    None if the journal was already closed. The journal is finished once the
+    controller is idle or the pattern is skipped, or left resumable if the
+    link fails first. Returns whether the controller became idle.
+    """
+    idle = asyncio.ensure_future(connection_manager.wait_for_idle_async())
+    try:
+        while not idle.done():
+            if connection_supervisor.failure:
+                # Resumed from the last checkpoint once reconnected
+                checkpoint_journal.close()
+                return False
+            if state.skip_requested:
+                # The halt of the skip flushes the moves still queued
+                checkpoint_journal.finish()
+                return False
+            await asyncio.wait({idle}, timeout=PUBLISH_INTERVAL_S)
+            if not state.stop_requested:
+                progress.publish()
+            if base and checkpoint_journal.due():
+                executed = ack_ledger.reached_index()
+                checkpoint_journal.checkpoint(executed, base[0] + float(compiled.rel_x[executed]),
+                                              base[1] + float(compiled.rel_y[executed]))
+    finally:
+        if not idle.done():
+            idle.cancel()
+    checkpoint_journal.finish()
+    return True
+
+def _restart_stream(thetas, rhos, rel_xs, rel_ys, index):
+    """
+    Recover from a move of the incremental stream the controller rejected,
+    which would offset every later move: stop and flush the queued moves,
+    read the position back and lead in to point `index` with an absolute
+    move. Returns the new machine position of the pattern's origin, or None
+    if the controller could not be stopped.
+    """
+    logger.warning(f"Controller rejected the move to point {index}, resyncing and continuing from there")
+    if connection_manager.halt() is None:
+        return None
+    connection_manager.send_command("G90")
+    move_polar(thetas[index], rhos[index])
+    connection_manager.send_command("G91")
+    ack_ledger.begin(thetas, rhos, index)
+    return state.machine_x - rel_xs[index], state.machine_y - rel_ys[index]
+
+def _execute_compiled_pattern(file_path, compiled, tracker, progress, start_index=0, rotation=None):
+    """
+    Stream a compiled pattern to the controller, from point `start_index` on,
+    rotated by `rotation` radians (chosen by get_start_rotation if None).
+    Runs on the motion executor. Returns the machine position of the
+    pattern's origin while its journal is still open, see _drain_pattern.
+    """
+    total_coordinates = compiled.point_count
+    reset_theta()
+    if rotation is None:
+        rotation = get_start_rotation(file_path, float(compiled.thetas[0]))
+        if rotation:
+            # The lead-in would otherwise have turned by the whole offset
+            logger.info(f"Rotating {file_path} by {rotation:.3f} rad to start near the ball's angle")
+    if state.plan_stats is not None:
+        state.plan_stats['start_rotation'] = rotation
+        state.plan_stats['reversed'] = compiled.reverse
+    thetas = (compiled.thetas + rotation).tolist() if rotation else compiled.thetas.tolist()
+    rhos = compiled.rhos.tolist()
+    rel_xs, rel_ys = compiled.rel_x.tolist(), compiled.rel_y.tolist()
+    feed_factors = compiled.feed_factors.tolist() if compiled.feed_factors is not None else None
+    if start_index:
+        # Only the angle modulo a turn matters, lead in to the start point the short way round
+        turns = round((thetas[start_index] - state.current_theta) / (2 * pi))
+        state.current_theta += turns * 2 * pi
+        logger.info(f"Resuming {file_path} from point {start_index} of {total_coordinates}")
+    if state.led_controller:
+        effect_playing(state.led_controller)
+    # Speed changes during the pattern are applied as feed overrides from 100%
+    connection_manager.reset_feed_override()
+
+    # Lead in to the first point with an absolute move from wherever the ball is,
+    # the compiled commands then move incrementally from there
+    move_polar(thetas[start_index], rhos[start_index])
+    base_x = state.machine_x - rel_xs[start_index]
+    base_y = state.machine_y - rel_ys[start_index]
+    bytes_sent_before = state.conn.bytes_sent
+    base_speed = state.speed
+    # Feed the moves are streamed at, the override scales it to state.speed
+    stream_speed = base_speed
+    connection_manager.send_command("G91")
+    ack_ledger.begin(thetas, rhos, start_index)
+    checkpoint_journal.begin(file_path, compiled.key, total_coordinates, start_index, rotation, compiled.reverse)
+    progress.update(start_index)
+    # A rejection left over from a pattern that was stopped does not apply here
+    state.conn.streamer.take_rejected()
+    completed = False
+    try:
+        while True:
+            # Point to start the stream over from after the controller rejected a move
+            restart_index = None
+            commands = itertools.islice(compiled.commands(), start_index, None)
+            for i, command in enumerate(commands, start=start_index + 1):
+                if state.conn.streamer.rejected is not None:
+                    restart_index = state.conn.streamer.take_rejected()
+                    break
+
+                if state.stop_requested:
+                    logger.info("Execution stopped by user")
+                    if state.led_controller:
+                        effect_idle(state.led_controller)
+                    break
+            
+                if state.skip_requested:
+                    # skip_pattern halts the controller, the queued moves are not waited for
+                    logger.info("Skipping pattern...")
+                    if state.led_controller:
+                        effect_idle(state.led_controller)
+                    break
+
+                # Wait for resume if paused
+                if state.pause_requested:
+                    logger.info("Execution paused...")
+                    if state.led_controller:
+                        effect_idle(state.led_controller)
+                    motion_executor.wait_if_paused()
+                    logger.info("Execution resumed...")
+                    if state.stop_requested:
+                        continue
+                    if state.led_controller:
+                        effect_playing(state.led_controller)
+
+                if state.speed != base_speed:
+                    with speed_lock:
+                        speed, override = state.speed, state.conn.feed_override
+                    # The override applies from the point the ball has reached, which
+                    # the model simulated at the old speed
+                    tracker.rescale(ack_ledger.reached_index(), base_speed / speed)
+                    base_speed = speed
+                    stream_speed = speed * 100 / override
+
+                # Compiled commands carry no feed rate; the encoder only adds F
+                # when the segment's feed differs from the last one sent
+                feed = stream_speed * feed_factors[i - 1] if feed_factors else stream_speed
+                command = state.conn.encoder.append_feed(command, feed)
+                if not connection_manager.send_command(command, tag=i):
+                    # Stopped while waiting for room, the point was never sent
+                    break
+                state.current_theta = thetas[i]
+                state.current_rho = rhos[i]
+                state.machine_x = base_x + rel_xs[i]
+                state.machine_y = base_y + rel_ys[i]
+            
+                progress.update(i)
+                if checkpoint_journal.due():
+                    executed = ack_ledger.reached_index()
+                    checkpoint_journal.checkpoint(executed, base_x + rel_xs[executed], base_y + rel_ys[executed])
+            else:
+                # The last lines may still be rejected after they were sent
+                state.conn.streamer.wait_until_drained()
+                restart_index = state.conn.streamer.take_rejected()
+            if restart_index is None:
+                break
+            base = _restart_stream(thetas, rhos, rel_xs, rel_ys, restart_index)
+            if base is None:
+                break
+            base_x, base_y = base
+            # The reset put the feed override back to 100%
+            base_speed = stream_speed = state.speed
+            start_index = restart_index
+        # Stopped or skipped on purpose counts as done, a lost connection does not
+        completed = state.conn is not None and not connection_supervisor.failure
+    finally:
+        if not completed:
+            # Continue from the point the ledger saw executed, not the last checkpoint
+            executed = ack_ledger.reached_index()
+            checkpoint_journal.checkpoint(executed, base_x + rel_xs[executed], base_y + rel_ys[executed])
+            checkpoint_journal.close()
+        elif state.stop_requested or state.skip_requested:
+            checkpoint_journal.finish()
+        if state.conn:
+            connection_manager.send_command("G90")
+            # Incremental moves left the encoder's last absolute position behind
+            state.conn.encoder.forget_position()
+            bytes_sent = state.conn.bytes_sent - bytes_sent_before
+            encoding = (compiled.stats or {}).get('encoding')
+            if encoding:
+                encoding['bytes_sent'] = bytes_sent
+                saved = 1 - encoding['bytes'] / encoding['verbose_bytes'] if encoding['verbose_bytes'] else 0
+                logger.info(f"Streamed {bytes_sent} bytes for {file_path} "
+                            f"({encoding['bytes']} vs {encoding['verbose_bytes']} verbose, {saved:.0%} saved)")
+    # The journal stays open for the moves the planner still has to run
+    return (base_x, base_y) if checkpoint_journal.file else None
+
+def get_pattern_endpoints(metadata, position, rotation_safe=False):
+    """
+    Predict the (start, end) points, as (theta, rho), of the pattern described
+    by `metadata` when it is started with the ball at `position`, reversed and
+    rotated the way run_theta_rho_file would.
+    """
+    first = (metadata['first_coordinate']['x'], metadata['first_coordinate']['y'])
+    last = (metadata['last_coordinate']['x'], metadata['last_coordinate']['y'])
+    if state.auto_reverse and get_reverse_saving(position, metadata, rotation_safe) > 0:
+        first, last = last, first
+    if state.start_rotation and rotation_safe:
+        rotation = position[0] - first[0]
+        first, last = (position[0], first[1]), (last[0] + rotation, last[1])
+    return first, last
+
+def build_pattern_sequence(file_paths, clear_pattern):
+    """Return the playlist with a clear pattern inserted before each pattern, see plan_pattern_sequence."""
+    return [path for path, _ in plan_pattern_sequence(file_paths, clear_pattern)]
+
+def plan_pattern_sequence(file_paths, clear_pattern, dry_run=False):
+    """
+    Return the playlist with a clear pattern inserted before each pattern, as
+    (file, seconds) pairs. Seconds are the modelled time of the transitions
+    planned in adaptive mode and None for everything else.
+
+    In adaptive mode a full clear is only used where it is needed. Going by
+    the cached metadata, from where the ball is predicted to be to where the
+    next pattern starts, transitions.plan_transition may connect the two
+    directly or with a short spiral instead. The counts and the time saved
+    are published in state.transition_stats. A dry run publishes nothing and
+    writes neither spirals nor compiled clear patterns, leaving the file of
+    its spirals None.
+    """
+    sequence = []
+    if clear_pattern != 'adaptive':
+        if not dry_run:
+            state.transition_stats = None
+        for path in file_paths:
+            # Add clear pattern if specified
+            if clear_pattern and clear_pattern != 'none':
+                clear_file_path = get_clear_pattern_file(clear_pattern, path)
+                if clear_file_path:
+                    sequence.append((clear_file_path, None))
+            sequence.append((path, None))
+        return sequence
+
+    from modules.core.cache_manager import ensure_pattern_metadata
+    from modules.core import transitions
+    stats = {kind: 0 for kind in transitions.TRANSITION_KINDS}
+    stats['time_saved'] = 0.0
+    clear_times = {}
+    position = (state.current_theta, state.current_rho)
+    for path in file_paths:
+        metadata = ensure_pattern_metadata(get_metadata_name(path))
+        if not metadata or not metadata.get('first_coordinate') or not metadata.get('last_coordinate'):
+            # Empty or unreadable, run_theta_rho_file skips it
+            sequence.append((path, None))
+            continue
+        rotation_safe = is_rotation_safe(path)
+        start, end = get_pattern_endpoints(metadata, position, rotation_safe)
+        clear_file = get_clear_pattern_file('adaptive', path, first_rho=start[1])
+        if clear_file not in clear_times:
+            try:
+                clear_times[clear_file] = estimate_pattern_duration(clear_file, cache=not dry_run) or 0.0
+            except OSError as e:
+                logger.warning(f"Cannot estimate {clear_file}: {str(e)}")
+                clear_times[clear_file] = 0.0
+        kind, transition_file, saved = transitions.plan_transition(position, start, clear_file,
+                                                                   clear_times[clear_file], state,
+                                                                   write=not dry_run)
+        stats[kind] += 1
+        stats['time_saved'] += saved
+        logger.debug(f"Transition to {path}: {kind}, {saved:.0f}s saved")
+        if kind != transitions.TRANSITION_DIRECT and (transition_file or dry_run):
+            sequence.append((transition_file, clear_times[clear_file] - saved))
+        if kind == transitions.TRANSITION_CLEAR:
+            clear_metadata = ensure_pattern_metadata(get_metadata_name(clear_file))
+            if clear_metadata and clear_metadata.get('last_coordinate'):
+                position = (clear_metadata['last_coordinate']['x'], clear_metadata['last_coordinate']['y'])
+                start, end = get_pattern_endpoints(metadata, position, rotation_safe)
+        sequence.append((path, None))
+        position = end
+
+    if dry_run:
+        return sequence
+    state.transition_stats = stats
+    logger.info(f"Transitions: {stats['direct']} direct, {stats['spiral']} spiral, {stats['clear']} full clear, "
+                f"{stats['time_saved']:.0f}s saved over full clears")
+    return sequence
+
+def estimate_playlist_duration(file_paths, pause_time=0, clear_pattern=None):
+    """
+    Estimate one pass of a playlist as run_theta_rho_files plays it, with its
+    clear patterns or adaptive transitions and the pauses between patterns,
+    at the current speed. Nothing is compiled to the cache or written.
+
+    Returns:
+        Dict with the total, the seconds of every pattern (None if empty),
+        counted once per play, and the seconds spent on clearing and pausing.
+    """
+    sequence = plan_pattern_sequence(file_paths, clear_pattern, dry_run=True)
+    patterns = {}
+    drawing = clearing = pausing = 0.0
+    for idx, (path, seconds) in enumerate(sequence):
+        # Unwritten spirals have no file, they are transitions like clear patterns
+        clear = path is None or is_clear_pattern(path)
+        if seconds is None:
+            seconds = estimate_pattern_duration(path, cache=False)
+        if clear:
+            clearing += seconds or 0.0
+        else:
+            patterns[path] = seconds
+            drawing += seconds or 0.0
+            if idx < len(sequence) - 1:
+                pausing += pause_time
+    total = drawing + clearing + pausing
+    return {"total": total, "patterns": patterns, "clearing": clearing, "pausing": pausing}
+
+def optimize_playlist_order(file_paths):
+    """
+    Return the playlist reordered to keep the travel from the ball through
+    every pattern short, see playlist_order.plan_order. Endpoints come from
+    the metadata cache; patterns without any are played last, in the order given.
+    """
+    from modules.core.cache_manager import ensure_pattern_metadata
+    from modules.core import playlist_order
+    known, unknown = [], []
+    starts, ends, any_angle = [], [], []
+    for path in file_paths:
+        metadata = ensure_pattern_metadata(get_metadata_name(path))
+        if not metadata or not metadata.get('first_coordinate') or not metadata.get('last_coordinate'):
+            unknown.append(path)
+            continue
+        known.append(path)
+        first, last = metadata['first_coordinate'], metadata['last_coordinate']
+        starts.append((first['x'], first['y']))
+        ends.append((last['x'], last['y']))
+        any_angle.append(bool(state.start_rotation and is_rotation_safe(path)))
+    order = playlist_order.plan_order((state.current_theta, state.current_rho), starts, ends,
+                                      state.table_type, any_angle)
+    return [known[i] for i in order] + unknown
+
+async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_mode="single", shuffle=False,
+                              optimize_order=False):
+    """
+    Run multiple .thr files in sequence with options. The order is shuffled
+    or, with optimize_order, planned to minimize travel anew for every pass.
+    """
     state.stop_requested = False
     
     # Set initial playlist state
@@ -327,39 +742,19 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
     if not progress_update_task:
         progress_update_task = asyncio.create_task(broadcast_progress())
     
-    
-    if shuffle:
-        random.shuffle(file_paths)
-        logger.info("Playlist shuffled")
-
-
-    if shuffle:
-        random.shuffle(file_paths)
-        logger.info("Playlist shuffled")
 
     try:
         while True:
-            # Construct the complete pattern sequence
-            pattern_sequence = []
-            for path in file_paths:
-                # Add clear pattern if specified
-                if clear_pattern and clear_pattern != 'none':
-                    clear_file_path = get_clear_pattern_file(clear_pattern, path)
-                    if clear_file_path:
-                        pattern_sequence.append(clear_file_path)
-                
-                # Add main pattern
-                pattern_sequence.append(path)
-
-            # Shuffle if requested
-            if shuffle:
-                # Get pairs of patterns (clear + main) to keep them together
-                pairs = [pattern_sequence[i:i+2] for i in range(0, len(pattern_sequence), 2)]
-                random.shuffle(pairs)
-                # Flatten the pairs back into a single list
-                pattern_sequence = [pattern for pair in pairs for pattern in pair]
+            if optimize_order:
+                file_paths = await asyncio.to_thread(optimize_playlist_order, file_paths)
+                logger.info("Playlist ordered to minimize travel")
+            elif shuffle:
+                random.shuffle(file_paths)
                 logger.info("Playlist shuffled")
 
+            # Construct the complete pattern sequence
+            pattern_sequence = await asyncio.to_thread(build_pattern_sequence, file_paths, clear_pattern)
+
             # Set the playlist to the first pattern
             state.current_playlist = pattern_sequence
             # Execute the pattern sequence
@@ -375,6 +770,12 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
                 # Execute the pattern
                 await run_theta_rho_file(file_path, is_playlist=True)
 
+                if state.link_interrupted:
+                    # The connection supervisor continues the pattern after reconnecting
+                    logger.info("Playlist waiting for the interrupted pattern to be continued")
+                    while state.link_interrupted and not state.stop_requested:
+                        await asyncio.sleep(0.1)
+
                 # Handle pause between patterns
                 if idx < len(pattern_sequence) - 1 and not state.stop_requested and pause_time > 0 and not state.skip_requested:
                     # Check if current pattern is a clear pattern
@@ -433,12 +834,19 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
         
         logger.info("All requested patterns completed (or stopped) and state cleared")
 
-def stop_actions(clear_playlist = True):
-    """Stop all current actions."""
+def stop_actions(clear_playlist = True, halt = True):
+    """
+    Stop all current actions. With halt, the ball is stopped with a feed hold
+    and the queued moves are flushed right away instead of running out.
+    """
+    requested_at = time.time()
     try:
+        if halt and state.conn:
+            # Not queued on the motion executor, whose job may be blocked on
+            # the controller until the queues are flushed
+            connection_manager.halt_in_background(requested_at)
         with state.pause_condition:
-            state.pause_requested = False
-            state.stop_requested = True
+            motion_executor.stop()
             state.current_playing_file = None
             state.execution_progress = None
             state.is_clearing = False
@@ -448,6 +856,8 @@ def stop_actions(clear_playlist = True):
                 state.current_playlist = None
                 state.current_playlist_index = None
                 state.playlist_mode = None
+                # An interrupted pattern is not continued after a stop
+                state.link_interrupted = False
                 
                 # Cancel progress update task if we're clearing the playlist
                 global progress_update_task
@@ -455,11 +865,12 @@ def stop_actions(clear_playlist = True):
                     progress_update_task.cancel()
                 
             state.pause_condition.notify_all()
-            connection_manager.update_machine_position()
+            # Queued behind the running job, which exits as soon as it sees the stop
+            motion_executor.submit(connection_manager.update_machine_position)
     except Exception as e:
         logger.error(f"Error during stop_actions: {e}")
         # Ensure we still update machine position even if there's an error
-        connection_manager.update_machine_position()
+        motion_executor.submit(connection_manager.update_machine_position)
 
 def move_polar(theta, rho):
     """
@@ -485,51 +896,115 @@ def move_polar(theta, rho):
     # if rho > (1-soft_limit_outter):
     #     rho = (1-soft_limit_outter)
     
-    if state.table_type == 'dune_weaver_mini':
-        x_scaling_factor = 2
-        y_scaling_factor = 3.7
-    else:
-        x_scaling_factor = 2
-        y_scaling_factor = 5
+    (new_x_abs,), (new_y_abs,) = kinematics.compute_machine_coordinates(
+        [theta], [rho],
+        state.current_theta, state.current_rho,
+        state.machine_x, state.machine_y,
+        state.x_steps_per_mm, state.y_steps_per_mm,
+        state.gear_ratio, state.table_type
+    )
     
-    delta_theta = theta - state.current_theta
-    delta_rho = rho - state.current_rho
-    x_increment = delta_theta * 100 / (2 * pi * x_scaling_factor)  # Added -1 to reverse direction
-    y_increment = delta_rho * 100 / y_scaling_factor
+    feed = state.speed
+    if state.dynamic_feed and state.y_steps_per_mm:
+        (factor,) = feed_planner.compute_feed_factors(
+            [state.current_theta, theta], [state.current_rho, rho],
+            state.x_steps_per_mm, state.y_steps_per_mm,
+            state.gear_ratio, state.table_type
+        )
+        feed = state.speed * float(factor)
     
-    x_total_steps = state.x_steps_per_mm * (100/x_scaling_factor)
-    y_total_steps = state.y_steps_per_mm * (100/y_scaling_factor)
-        
-    offset = x_increment * (x_total_steps * x_scaling_factor / (state.gear_ratio * y_total_steps * y_scaling_factor))
+    send_machine_move(theta, rho, float(new_x_abs), float(new_y_abs), feed)
 
-    if state.table_type == 'dune_weaver_mini':
-        y_increment -= offset
-    else:
-        y_increment += offset
-    
-    new_x_abs = state.machine_x + x_increment
-    new_y_abs = state.machine_y + y_increment
-    
-    # dynamic_speed = compute_dynamic_speed(rho, max_speed=state.speed)
-    
-    connection_manager.send_grbl_coordinates(round(new_x_abs, 3), round(new_y_abs,3), state.speed)
+def send_machine_move(theta, rho, machine_x, machine_y, feed=None):
+    """Send a move to precomputed absolute machine coordinates and track the new position."""
+    connection_manager.send_grbl_coordinates(round(machine_x, 3), round(machine_y, 3), feed or state.speed)
     state.current_theta = theta
     state.current_rho = rho
-    state.machine_x = new_x_abs
-    state.machine_y = new_y_abs
+    state.machine_x = machine_x
+    state.machine_y = machine_y
     
+def get_resume_checkpoint():
+    """Return the checkpoint of the interrupted pattern that can be resumed, or None."""
+    checkpoint = checkpoint_journal.resumable
+    if not checkpoint or not os.path.exists(checkpoint["file"]):
+        return None
+    return checkpoint
+
+def find_resume_index(compiled, checkpoint, machine_x, machine_y):
+    """
+    Return the index of the point at or after the checkpoint that the ball
+    stands on, or None if it is not near any of them. The controller keeps
+    running the moves it had buffered when the link dropped, so the ball is
+    usually some points past the last one seen executed.
+    """
+    if checkpoint.get("machine_x") is None or machine_x is None:
+        return None
+    start = checkpoint["index"]
+    end = min(start + RESUME_SEARCH_POINTS, compiled.point_count)
+    base_x = checkpoint["machine_x"] - compiled.rel_x[start]
+    base_y = checkpoint["machine_y"] - compiled.rel_y[start]
+    distances = np.hypot(base_x + compiled.rel_x[start:end] - machine_x,
+                         base_y + compiled.rel_y[start:end] - machine_y)
+    nearest = int(np.argmin(distances))
+    if distances[nearest] > RESUME_TOLERANCE_MM:
+        return None
+    return start + nearest
+
+async def resume_interrupted_pattern(rehome=True, is_playlist=False):
+    """
+    Continue the interrupted pattern from its last executed point. Without
+    rehome, homing is skipped if the ball still stands on the pattern, i.e.
+    the controller kept its position. With is_playlist, the run is part of
+    the playlist that is waiting for it.
+    """
+    checkpoint = get_resume_checkpoint()
+    if not checkpoint:
+        logger.warning("No interrupted pattern to resume")
+        return False
+    if not rehome:
+        from modules.core.gcode_compiler import load_compiled_pattern
+        compiled = await asyncio.to_thread(load_compiled_pattern, checkpoint["file"], checkpoint.get("reverse", False))
+        machine_x, machine_y = await motion_executor.run(connection_manager.get_machine_position)
+        index = find_resume_index(compiled, checkpoint, machine_x, machine_y) if compiled else None
+        if index is None:
+            logger.info("Position does not match the interrupted pattern, homing before resuming")
+            rehome = True
+        else:
+            # The ball is on the pattern at this point
+            checkpoint = dict(checkpoint, index=index)
+            state.current_theta = float(compiled.thetas[index]) + checkpoint.get("rotation", 0.0)
+            state.current_rho = float(compiled.rhos[index])
+            state.machine_x, state.machine_y = machine_x, machine_y
+    if rehome:
+        logger.info(f"Re-homing to resume {checkpoint['file']} from point {checkpoint['index']}")
+        await motion_executor.run(connection_manager.home)
+    await run_theta_rho_file(checkpoint["file"], is_playlist=is_playlist, checkpoint=checkpoint)
+    return True
+
 def pause_execution():
-    """Pause pattern execution using asyncio Event."""
+    """Pause pattern execution on the motion executor."""
     logger.info("Pausing pattern execution")
-    state.pause_requested = True
-    pause_event.clear()  # Clear the event to pause execution
+    # The moves already buffered in the controller would otherwise run out
+    connection_manager.feed_hold()
+    motion_executor.pause()
     return True
 
 def resume_execution():
-    """Resume pattern execution using asyncio Event."""
+    """Resume pattern execution on the motion executor."""
     logger.info("Resuming pattern execution")
-    state.pause_requested = False
-    pause_event.set()  # Set the event to resume execution
+    motion_executor.resume()
+    connection_manager.cycle_start()
+    return True
+
+def skip_pattern():
+    """
+    Skip the current pattern of a running playlist. Like a stop, the ball is
+    stopped and the queued moves are flushed instead of running out.
+    """
+    logger.info("Skipping current pattern")
+    if state.conn and state.current_playing_file:
+        connection_manager.halt_in_background()
+    motion_executor.skip()
     return True
     
 def reset_theta():
@@ -538,7 +1013,22 @@ def reset_theta():
     connection_manager.update_machine_position()
 
 def set_speed(new_speed):
-    state.speed = new_speed
+    """
+    Change the playback speed. While a pattern runs, the controller's feed
+    override is stepped to match so the moves already buffered speed up or
+    slow down too. Speeds beyond the override's range are reached by the
+    moves streamed from then on.
+    """
+    with speed_lock:
+        old_speed = state.speed
+        motion_executor.set_speed(new_speed)
+        conn = state.conn
+        if state.current_playing_file and not state.stop_requested and conn and old_speed:
+            # The feed the buffered moves were streamed at
+            stream_speed = old_speed * 100 / conn.feed_override
+            override = connection_manager.set_feed_override(new_speed / stream_speed * 100)
+            logger.info(f'Set new state.speed {new_speed} ({override}% feed override)')
+            return
     logger.info(f'Set new state.speed {new_speed}')
 
 def get_status():
@@ -554,7 +1044,12 @@ def get_status():
         "original_pause_time": getattr(state, 'original_pause_time', None),
         "connection_status": state.conn.is_connected() if state.conn else False,
         "current_theta": state.current_theta,
-        "current_rho": state.current_rho
+        "current_rho": state.current_rho,
+        "executed_point": ack_ledger.executed_point(),
+        "plan": state.plan_stats,
+        "last_stop_latency": state.last_stop_latency,
+        "resume_checkpoint": get_resume_checkpoint(),
+        "transitions": state.transition_stats
     }
     
     # Add playlist information if available
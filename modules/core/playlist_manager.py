@@ -86,7 +86,8 @@ def add_to_playlist(playlist_name, pattern):
     logger.info(f"Added pattern '{pattern}' to playlist '{playlist_name}'")
     return True
 
-async def run_playlist(playlist_name, pause_time=0, clear_pattern=None, run_mode="single", shuffle=False):
+async def run_playlist(playlist_name, pause_time=0, clear_pattern=None, run_mode="single", shuffle=False,
+                       optimize_order=False):
     """Run a playlist with the given options."""
     if pattern_manager.pattern_lock.locked():
         logger.warning("Cannot start playlist: Another pattern is already running")
@@ -105,7 +106,7 @@ async def run_playlist(playlist_name, pause_time=0, clear_pattern=None, run_mode
         return False, "Playlist is empty"
 
     try:
-        logger.info(f"Starting playlist '{playlist_name}' with mode={run_mode}, shuffle={shuffle}")
+        logger.info(f"Starting playlist '{playlist_name}' with mode={run_mode}, shuffle={shuffle}, optimize_order={optimize_order}")
         state.current_playlist = file_paths
         state.current_playlist_name = playlist_name
         asyncio.create_task(
@@ -115,6 +116,7 @@ async def run_playlist(playlist_name, pause_time=0, clear_pattern=None, run_mode
                 clear_pattern=clear_pattern,
                 run_mode=run_mode,
                 shuffle=shuffle,
+                optimize_order=optimize_order,
             )
         )
         return True, f"Playlist '{playlist_name}' is now running."
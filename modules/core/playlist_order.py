@@ -0,0 +1,127 @@
+"""Order the patterns of a playlist so the ball travels as little as possible between them."""
+import logging
+import random
+
+import numpy as np
+
+from modules.core import kinematics
+
+logger = logging.getLogger(__name__)
+
+# Candidates this much (relative) or this many mm worse than the best still count as a tie
+TIE_TOLERANCE = 0.1
+TIE_TOLERANCE_MM = 1.0
+# Improvement passes of 2-opt, each tries every segment reversal once
+MAX_2OPT_PASSES = 8
+
+def travel_matrix(starts, ends, table_type, any_angle=None):
+    """
+    Return the matrix of travel (mm) from the end of pattern i to the start of
+    pattern j. starts and ends are (theta, rho) pairs; any_angle marks
+    patterns that are rotated to start at whatever angle the ball is at.
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+    any_angle = np.zeros(len(starts), dtype=bool) if any_angle is None else np.asarray(any_angle, dtype=bool)
+    return kinematics.polar_travel(ends[:, None, 0], ends[:, None, 1], starts[None, :, 0], starts[None, :, 1],
+                                   table_type, any_angle[None, :])
+
+def tour_travel(order, lead_in, matrix):
+    """Total travel of playing the patterns in `order` after a lead-in from the ball."""
+    if not order:
+        return 0.0
+    return float(lead_in[order[0]] + sum(matrix[a, b] for a, b in zip(order, order[1:])))
+
+def greedy_tour(lead_in, matrix, rng):
+    """
+    Chain the patterns nearest-neighbour first, starting from the ball. Among
+    near-equal candidates one is picked at random, so repeated orderings of
+    the same playlist differ.
+    """
+    remaining = list(range(len(lead_in)))
+    order = []
+    costs = lead_in
+    while remaining:
+        candidates = np.asarray([costs[j] for j in remaining])
+        best = candidates.min()
+        ties = [j for j, cost in zip(remaining, candidates)
+                if cost <= best * (1 + TIE_TOLERANCE) + TIE_TOLERANCE_MM]
+        chosen = rng.choice(ties)
+        order.append(chosen)
+        remaining.remove(chosen)
+        costs = matrix[chosen]
+    return order
+
+def relocate(order, lead_in, matrix):
+    """
+    Move single patterns to wherever in the tour they add the least travel.
+    Returns True if any was moved.
+    """
+    improved = False
+    for pattern in list(order):
+        k = order.index(pattern)
+        rest = order[:k] + order[k + 1:]
+        # Travel saved by taking the pattern out
+        before = lead_in[pattern] if k == 0 else matrix[order[k - 1], pattern]
+        after = matrix[pattern, order[k + 1]] if k + 1 < len(order) else 0.0
+        bridge = 0.0
+        if k + 1 < len(order):
+            bridge = lead_in[order[k + 1]] if k == 0 else matrix[order[k - 1], order[k + 1]]
+        saved = before + after - bridge
+        # Travel added by putting it back before rest[p], or at the end for p == len(rest)
+        rest_array = np.asarray(rest)
+        into = np.concatenate(([lead_in[pattern]], matrix[rest_array, pattern]))
+        out_of = np.concatenate((matrix[pattern, rest_array], [0.0]))
+        replaced = np.concatenate(([lead_in[rest[0]]], matrix[rest_array[:-1], rest_array[1:]], [0.0]))
+        added = into + out_of - replaced
+        best = int(np.argmin(added))
+        if added[best] < saved - 1e-9:
+            order[:] = rest[:best] + [pattern] + rest[best:]
+            improved = True
+    return improved
+
+def improve_tour(order, lead_in, matrix, max_passes=MAX_2OPT_PASSES):
+    """
+    2-opt on the open tour: reverse the order of a run of patterns whenever
+    that shortens the total travel. Travel is not symmetric, an end and a
+    start are different points, so the reversed run is costed both ways.
+    Each pass also relocates single patterns, which 2-opt can't do cheaply.
+    """
+    order = list(order)
+    count = len(order)
+    if count < 3:
+        return order
+    for _ in range(max_passes):
+        improved = relocate(order, lead_in, matrix)
+        for i in range(count - 1):
+            # Travel along the run from i on, forwards and played in reverse order
+            forward = backward = 0.0
+            for j in range(i + 1, count):
+                forward += matrix[order[j - 1], order[j]]
+                backward += matrix[order[j], order[j - 1]]
+                before = lead_in[order[i]] if i == 0 else matrix[order[i - 1], order[i]]
+                after = matrix[order[j], order[j + 1]] if j + 1 < count else 0.0
+                new_before = lead_in[order[j]] if i == 0 else matrix[order[i - 1], order[j]]
+                new_after = matrix[order[i], order[j + 1]] if j + 1 < count else 0.0
+                if new_before + backward + new_after < before + forward + after - 1e-9:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    improved = True
+                    forward, backward = backward, forward
+        if not improved:
+            break
+    return order
+
+def plan_order(position, starts, ends, table_type, any_angle=None, rng=None):
+    """
+    Return the indices of the patterns in the order that keeps the travel from
+    the ball's (theta, rho) position through all of them short.
+    """
+    if len(starts) < 2:
+        return list(range(len(starts)))
+    rng = rng or random.Random()
+    lead_in = travel_matrix(starts, [position], table_type, any_angle)[0]
+    matrix = travel_matrix(starts, ends, table_type, any_angle)
+    order = improve_tour(greedy_tour(lead_in, matrix, rng), lead_in, matrix)
+    logger.info(f"Optimized order: {tour_travel(list(range(len(starts))), lead_in, matrix):.0f}mm "
+                f"-> {tour_travel(order, lead_in, matrix):.0f}mm of travel between patterns")
+    return order
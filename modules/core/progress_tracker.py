@@ -0,0 +1,78 @@
+"""Low-overhead progress accounting for pattern playback."""
+import os
+import sys
+import time
+
+# Shortest time (s) between two updates of the published progress
+PUBLISH_INTERVAL_S = 0.5
+
+def progress_bar_enabled():
+    """
+    Terminal progress bars are only drawn when asked for with
+    DUNE_WEAVER_PROGRESS_BAR=1, or by default when attached to a terminal.
+    """
+    setting = os.getenv('DUNE_WEAVER_PROGRESS_BAR')
+    if setting is not None:
+        return setting.lower() in ('1', 'true', 'yes', 'on')
+    return sys.stderr.isatty()
+
+class ProgressTracker:
+    """
+    Track how far playback got with a per-point cost of a clock read.
+
+    The loop calls update(index) for every point sent, but the elapsed and
+    remaining times are only computed, published to state.execution_progress
+    (read by get_status and the websocket) and drawn on the optional terminal
+    bar every PUBLISH_INTERVAL_S. With an ack ledger, progress is reported for
+    the point the ball has reached rather than the last one sent, and
+    publish() keeps it moving while the planner drains after the last point
+    was sent. 100% is only reported by finish(), once the controller is idle.
+    """
+    def __init__(self, state, total, start_time, duration_tracker=None, description=None,
+                 interval=PUBLISH_INTERVAL_S, show_bar=None, ledger=None):
+        self.state = state
+        self.total = total
+        self.start_time = start_time
+        self.duration_tracker = duration_tracker
+        self.interval = interval
+        self.ledger = ledger
+        self.sent = 0
+        self.current = 0
+        self.next_publish = 0
+        self.bar = None
+        if show_bar if show_bar is not None else progress_bar_enabled():
+            from tqdm import tqdm
+            self.bar = tqdm(total=total, unit="coords", desc=description, dynamic_ncols=True, mininterval=1.0)
+
+    def update(self, index):
+        """Record that the move to the point at `index` was sent."""
+        self.sent = index
+        if time.monotonic() >= self.next_publish:
+            self.publish()
+
+    def publish(self):
+        """Publish the progress of the point the ball has reached."""
+        self.next_publish = time.monotonic() + self.interval
+        index = self.sent
+        if self.ledger:
+            index = min(self.ledger.reached_index(), index)
+        # The last point only counts once the controller is idle, see finish()
+        index = min(index, self.total - 2)
+        elapsed_time = time.time() - self.start_time
+        remaining_time = self.duration_tracker.remaining(index, elapsed_time) if self.duration_tracker else None
+        self._set(index + 1, remaining_time, elapsed_time)
+
+    def finish(self):
+        """Publish 100% once the controller has run every move."""
+        self._set(self.total, 0, time.time() - self.start_time)
+
+    def _set(self, current, remaining_time, elapsed_time):
+        if self.bar and current > self.current:
+            self.bar.update(current - self.current)
+        self.current = current
+        self.state.execution_progress = (self.current, self.total, remaining_time, elapsed_time)
+
+    def close(self):
+        if self.bar:
+            self.bar.close()
+            self.bar = None
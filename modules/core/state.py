@@ -6,6 +6,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_ARC_FITTING = {
+    "dune_weaver": True,
+    "dune_weaver_mini": True,
+    "dune_weaver_pro": True,
+}
+
 class AppState:
     def __init__(self):
         # Private variables for properties
@@ -17,6 +23,8 @@ class AppState:
         
         # Regular state variables
         self.stop_requested = False
+        # Set while a pattern cut off by a lost link waits to be continued
+        self.link_interrupted = False
         self.pause_condition = threading.Condition()
         self.execution_progress = None
         self.is_clearing = False
@@ -34,6 +42,12 @@ class AppState:
         self.gear_ratio = 10
         # 0 for crash homing, 1 for auto homing
         self.homing = 0
+        # Motion limits reported by the controller, None until read
+        self.x_max_rate = None  # $110, mm/min
+        self.y_max_rate = None  # $111, mm/min
+        self.x_acceleration = None  # $120, mm/s^2
+        self.y_acceleration = None  # $121, mm/s^2
+        self.junction_deviation = None  # $11, mm
         
         self.STATE_FILE = "state.json"
         self.mqtt_handler = None  # Will be set by the MQTT handler
@@ -46,6 +60,31 @@ class AppState:
         self._playlist_mode = "loop"
         self._pause_time = 0
         self._clear_pattern = "none"
+        # G-code streaming mode: 'character_counting' or 'send_wait'
+        self.stream_mode = "character_counting"
+        # Path simplification tolerance in mm, 0 disables it
+        self.simplify_tolerance = 0.0
+        # Arc fitting on/off per table type
+        self.arc_fitting = dict(DEFAULT_ARC_FITTING)
+        # Scale each segment's feed rate to keep the ball's speed through the sand constant.
+        # Off by default, boosted segments run faster than the selected speed
+        self.dynamic_feed = False
+        # Statistics of the pre-streaming stages for the current pattern
+        self.plan_stats = None
+        # Status report polling rate in Hz for live position telemetry, 0 disables it
+        self.telemetry_rate = 10
+        # Rotate rotation-safe patterns so they start at the ball's current angle
+        self.start_rotation = False
+        # Patterns marked as looking the same when rotated, by path relative to the patterns directory
+        self.rotation_safe_patterns = set()
+        # Play a pattern backwards when its last point is closer to the ball than its first
+        self.auto_reverse = False
+        # Controller settings read with '$$', keyed by "port|firmware fingerprint"
+        self.settings_cache = {}
+        # Latencies (s) measured by the last stop, see connection_manager.halt
+        self.last_stop_latency = None
+        # Transitions planned for the running playlist, see pattern_manager.build_pattern_sequence
+        self.transition_stats = None
         self.load()
 
     @property
@@ -151,6 +190,11 @@ class AppState:
             "y_steps_per_mm": self.y_steps_per_mm,
             "gear_ratio": self.gear_ratio,
             "homing": self.homing,
+            "x_max_rate": self.x_max_rate,
+            "y_max_rate": self.y_max_rate,
+            "x_acceleration": self.x_acceleration,
+            "y_acceleration": self.y_acceleration,
+            "junction_deviation": self.junction_deviation,
             "current_playlist": self._current_playlist,
             "current_playlist_name": self._current_playlist_name,
             "current_playlist_index": self.current_playlist_index,
@@ -159,6 +203,15 @@ class AppState:
             "clear_pattern": self._clear_pattern,
             "port": self.port,
             "wled_ip": self.wled_ip,
+            "stream_mode": self.stream_mode,
+            "simplify_tolerance": self.simplify_tolerance,
+            "arc_fitting": self.arc_fitting,
+            "dynamic_feed": self.dynamic_feed,
+            "telemetry_rate": self.telemetry_rate,
+            "start_rotation": self.start_rotation,
+            "rotation_safe_patterns": sorted(self.rotation_safe_patterns),
+            "auto_reverse": self.auto_reverse,
+            "settings_cache": self.settings_cache,
         }
 
     def from_dict(self, data):
@@ -177,6 +230,11 @@ class AppState:
         self.y_steps_per_mm = data.get("y_steps_per_mm", 0.0)
         self.gear_ratio = data.get('gear_ratio', 10)
         self.homing = data.get('homing', 0)
+        self.x_max_rate = data.get('x_max_rate')
+        self.y_max_rate = data.get('y_max_rate')
+        self.x_acceleration = data.get('x_acceleration')
+        self.y_acceleration = data.get('y_acceleration')
+        self.junction_deviation = data.get('junction_deviation')
         self._current_playlist = data.get("current_playlist", None)
         self._current_playlist_name = data.get("current_playlist_name", None)
         self.current_playlist_index = data.get("current_playlist_index", None)
@@ -185,6 +243,15 @@ class AppState:
         self._clear_pattern = data.get("clear_pattern", "none")
         self.port = data.get("port", None)
         self.wled_ip = data.get('wled_ip', None)
+        self.stream_mode = data.get('stream_mode', "character_counting")
+        self.simplify_tolerance = data.get('simplify_tolerance', 0.0)
+        self.arc_fitting = {**DEFAULT_ARC_FITTING, **data.get('arc_fitting', {})}
+        self.dynamic_feed = data.get('dynamic_feed', False)
+        self.telemetry_rate = data.get('telemetry_rate', 10)
+        self.start_rotation = data.get('start_rotation', False)
+        self.rotation_safe_patterns = set(data.get('rotation_safe_patterns', []))
+        self.auto_reverse = data.get('auto_reverse', False)
+        self.settings_cache = data.get('settings_cache', {})
 
     def save(self):
         """Save the current state to a JSON file."""
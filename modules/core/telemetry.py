@@ -0,0 +1,114 @@
+"""Live position telemetry sampled from the controller's '?' status reports."""
+import logging
+import threading
+import time
+from collections import deque
+
+from modules.connection import connection_manager
+from modules.connection.response_router import RESPONSE_STATUS
+from modules.core import kinematics
+from modules.core.ack_ledger import ack_ledger
+from modules.core.state import state
+
+logger = logging.getLogger(__name__)
+
+MIN_RATE_HZ = 1
+MAX_RATE_HZ = 20
+# Samples kept in the ring buffer, a minute at the highest rate
+HISTORY_SIZE = MAX_RATE_HZ * 60
+
+def clamp_rate(rate):
+    """Clamp a polling rate to the supported range, 0 means disabled."""
+    if not rate or rate <= 0:
+        return 0
+    return min(max(rate, MIN_RATE_HZ), MAX_RATE_HZ)
+
+class TelemetryPoller:
+    """
+    Poll the controller with '?' at state.telemetry_rate and keep the parsed
+    reports as timestamped samples in a ring buffer.
+
+    '?' is a real-time command: it takes no RX buffer space and is answered
+    without an ack, so polling runs alongside streaming. Reports are picked up
+    from the connection's response router, which also means reports requested
+    by anyone else end up in the buffer.
+    """
+    def __init__(self, history_size=HISTORY_SIZE):
+        self.samples = deque(maxlen=history_size)
+        self.lock = threading.Lock()
+        self.sample_count = 0
+        self.router = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="telemetry-poller", daemon=True)
+        self.thread.start()
+        logger.info(f"Telemetry poller started at {clamp_rate(state.telemetry_rate)} Hz")
+
+    def stop(self):
+        self.stop_event.set()
+        self._attach(None)
+
+    def _attach(self, router):
+        """Follow the router of the current connection across reconnects."""
+        if router is self.router:
+            return
+        if self.router:
+            self.router.unsubscribe(RESPONSE_STATUS, self.handle_status)
+        if router:
+            router.subscribe(RESPONSE_STATUS, self.handle_status)
+        self.router = router
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            rate = clamp_rate(state.telemetry_rate)
+            conn = state.conn
+            router = conn.router if conn else None
+            self._attach(router)
+            if rate and router:
+                try:
+                    if conn.is_connected():
+                        conn.send('?')
+                except Exception as e:
+                    logger.debug(f"Status poll failed: {str(e)}")
+            self.stop_event.wait(1 / rate if rate else 1)
+
+    def handle_status(self, line):
+        """Turn a status report into a sample. Runs on the response router's thread."""
+        report = connection_manager.parse_status_report(line)
+        if not report:
+            return
+        report["time"] = time.time()
+        ack_ledger.record_status(report)
+        executed = ack_ledger.executed_point()
+        if executed:
+            report["point_index"] = executed["index"]
+        if state.y_steps_per_mm and state.x_steps_per_mm and state.gear_ratio:
+            report["theta"], report["rho"] = kinematics.compute_polar_coordinates_from_state(
+                report["machine_x"], report["machine_y"], state
+            )
+        with self.lock:
+            self.samples.append(report)
+            self.sample_count += 1
+
+    def latest(self):
+        """Return the newest sample, or None if there is none yet."""
+        with self.lock:
+            return self.samples[-1] if self.samples else None
+
+    def history(self, seconds=None):
+        """Return the buffered samples, optionally only those of the last `seconds`."""
+        with self.lock:
+            samples = list(self.samples)
+        if seconds is None:
+            return samples
+        cutoff = time.time() - seconds
+        return [sample for sample in samples if sample["time"] >= cutoff]
+
+
+# Create a singleton instance that you can import elsewhere:
+telemetry_poller = TelemetryPoller()
@@ -0,0 +1,100 @@
+"""Connect one pattern to the next with the cheapest transition that still looks right."""
+import logging
+import math
+import os
+from math import pi
+
+import numpy as np
+
+from modules.core import kinematics, duration_model
+from modules.core.pattern_manager import TRANSITION_DIR
+
+logger = logging.getLogger(__name__)
+
+TRANSITION_DIRECT = 'direct'  # The lead-in move alone
+TRANSITION_SPIRAL = 'spiral'  # A short spiral through the band between the two radii
+TRANSITION_CLEAR = 'clear'    # A full clear pattern
+TRANSITION_KINDS = (TRANSITION_DIRECT, TRANSITION_SPIRAL, TRANSITION_CLEAR)
+
+# Radius change the lead-in move may cover on its own
+DIRECT_MAX_RHO = 0.05
+# Radius change still bridged with a spiral instead of a full clear
+SPIRAL_MAX_RHO = 0.5
+# Rho per turn, about the spacing of the bundled clear patterns
+SPIRAL_PITCH = 0.03
+SPIRAL_POINTS_PER_TURN = 64
+# Spirals are cached per endpoint rounded to this many decimals
+ENDPOINT_DECIMALS = 2
+
+def choose_transition(end, start):
+    """Kind of transition from a pattern ending at `end` to one starting at `start`, both (theta, rho)."""
+    gap = abs(start[1] - end[1])
+    if gap <= DIRECT_MAX_RHO:
+        return TRANSITION_DIRECT
+    if gap <= SPIRAL_MAX_RHO:
+        return TRANSITION_SPIRAL
+    return TRANSITION_CLEAR
+
+def spiral_coordinates(end, start, pitch=SPIRAL_PITCH):
+    """
+    Return the (theta, rho) points of a spiral from `end` to `start` winding
+    outwards or inwards by `pitch` per turn. It ends at start's angle, modulo a
+    turn, so neither its lead-in nor the next pattern's has to turn.
+    """
+    theta = end[0] % (2 * pi)
+    turns = max(1, math.ceil(abs(start[1] - end[1]) / pitch))
+    sweep = (start[0] - theta) % (2 * pi) + turns * 2 * pi
+    count = max(2, math.ceil(sweep / (2 * pi) * SPIRAL_POINTS_PER_TURN) + 1)
+    thetas = np.linspace(theta, theta + sweep, count)
+    rhos = np.linspace(end[1], start[1], count)
+    return list(zip(thetas.tolist(), rhos.tolist()))
+
+def estimate_time(coordinates, state):
+    """Model time (s) of running the points at the current speed."""
+    if len(coordinates) < 2 or not state.y_steps_per_mm:
+        return 0.0
+    xs, ys = kinematics.compute_relative_machine_coordinates(coordinates, state)
+    feeds = np.full(len(coordinates) - 1, float(state.speed))
+    max_rates, accelerations, junction_deviation = duration_model.get_limits(state)
+    return float(duration_model.simulate_segment_times(xs, ys, feeds, max_rates, accelerations,
+                                                       junction_deviation).sum())
+
+def write_spiral(end, start, coordinates):
+    """Write a spiral to the transition cache unless it is there already, and return its path."""
+    name = "spiral_{:.2f}_{:.2f}_{:.2f}_{:.2f}.thr".format(end[0], end[1], start[0], start[1])
+    path = os.path.join(TRANSITION_DIR, name)
+    if os.path.exists(path):
+        return path
+    os.makedirs(TRANSITION_DIR, exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.writelines(f"{theta:.5f} {rho:.5f}\n" for theta, rho in coordinates)
+    os.replace(path + ".tmp", path)
+    return path
+
+def plan_transition(end, start, clear_file, clear_time, state, write=True):
+    """
+    Pick how to get from a pattern ending at `end` to one starting at
+    `start`, both (theta, rho), instead of always running `clear_file`, which
+    takes `clear_time` seconds. Without write, a spiral is planned but not
+    written to the transition cache.
+
+    Returns:
+        Tuple of (kind, file to run before the pattern or None, seconds saved
+        compared to the full clear).
+    """
+    end = (round(end[0] % (2 * pi), ENDPOINT_DECIMALS), round(end[1], ENDPOINT_DECIMALS))
+    start = (round(start[0] % (2 * pi), ENDPOINT_DECIMALS), round(start[1], ENDPOINT_DECIMALS))
+    kind = choose_transition(end, start)
+    if kind == TRANSITION_DIRECT:
+        return kind, None, clear_time
+    if kind == TRANSITION_SPIRAL:
+        coordinates = spiral_coordinates(end, start)
+        spiral_time = estimate_time(coordinates, state)
+        if spiral_time < clear_time:
+            if not write:
+                return kind, None, clear_time - spiral_time
+            try:
+                return kind, write_spiral(end, start, coordinates), clear_time - spiral_time
+            except OSError as e:
+                logger.error(f"Failed to write transition spiral: {str(e)}")
+    return TRANSITION_CLEAR, clear_file, 0.0
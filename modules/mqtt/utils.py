@@ -3,12 +3,13 @@ import os
 from typing import Dict, Callable
 from modules.core.pattern_manager import (
     run_theta_rho_file, stop_actions, pause_execution,
-    resume_execution, THETA_RHO_DIR,
+    resume_execution, set_speed, THETA_RHO_DIR,
     run_theta_rho_files, list_theta_rho_files
 )
 from modules.core.playlist_manager import get_playlist, run_playlist
 from modules.connection.connection_manager import home
 from modules.core.state import state
+from modules.core.motion_executor import motion_executor
 
 def create_mqtt_callbacks() -> Dict[str, Callable]:
     """Create and return the MQTT callback registry.
@@ -16,9 +17,10 @@ def create_mqtt_callbacks() -> Dict[str, Callable]:
     Note: run_theta_rho_file and run_playlist are async functions,
     while pause_execution, resume_execution, and stop_actions are sync functions.
     The MQTT handler will check and handle both async and sync appropriately.
+    Homing blocks on the controller, so it is queued on the motion executor.
     """
-    def set_speed(speed):
-        state.speed = speed
+    def queue_home():
+        motion_executor.submit(home)
 
     return {
         'run_pattern': run_theta_rho_file,  # async function
@@ -26,7 +28,7 @@ def create_mqtt_callbacks() -> Dict[str, Callable]:
         'stop': stop_actions,  # sync function
         'pause': pause_execution,  # sync function
         'resume': resume_execution,  # sync function
-        'home': home,
+        'home': queue_home,
         'set_speed': set_speed
     }
 
@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Make the repository's modules importable without installing anything
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The app saves state.json and its caches to the working directory on import,
+# keep them out of the checkout
+os.chdir(tempfile.mkdtemp(prefix="dune-weaver-tests-"))
+
+from modules.core import pattern_manager  # noqa: E402
+from modules.core.state import state  # noqa: E402
+
+
+async def no_broadcast():
+    pass
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    """A dune_weaver table and the path of a 200 point pattern to play on it."""
+    monkeypatch.chdir(tmp_path)
+    # Progress is broadcast to the web app's clients, there are none here
+    monkeypatch.setattr(pattern_manager, "broadcast_progress", no_broadcast)
+    monkeypatch.setattr(state, "telemetry_rate", 0, raising=False)
+    state.x_steps_per_mm, state.y_steps_per_mm, state.gear_ratio = 200, 287.5, 10
+    state.table_type = "dune_weaver"
+    pattern = tmp_path / "zigzag.thr"
+    # A zigzag, which neither arc fitting nor path simplification shortens
+    pattern.write_text("".join(f"{i * 0.05:.3f} {0.3 + 0.2 * (i % 2):.3f}\n" for i in range(200)))
+    return str(pattern)
@@ -0,0 +1,50 @@
+import time
+
+from modules.connection import connection_manager
+from modules.connection.connection_supervisor import connection_supervisor
+
+BANNER = "Grbl 1.1h ['$' for help]"
+
+
+class SilentController(connection_manager.BaseConnection):
+    """A controller that takes every line and never answers."""
+    def __init__(self):
+        self.configure_streaming('character_counting')
+
+    def send(self, data):
+        pass
+
+    def readline(self):
+        time.sleep(0.001)
+        return ''
+
+    def in_waiting(self):
+        return 0
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.router.stop()
+
+
+def test_unexpected_banner_is_reported_as_a_failed_link(monkeypatch):
+    failures = []
+    monkeypatch.setattr(connection_supervisor, "report_failure", failures.append)
+    controller = SilentController()
+    controller.streamer.send_line("G91 G1 X1 Y1 F600")
+    controller.router.dispatch(BANNER)
+    controller.close()
+    # Its lines were lost with the reset, waiting for their acks would hang
+    assert not controller.streamer.in_flight
+    assert failures == ["Controller reset"]
+
+
+def test_banner_of_a_halt_is_expected(monkeypatch):
+    failures = []
+    monkeypatch.setattr(connection_supervisor, "report_failure", failures.append)
+    controller = SilentController()
+    controller.reset_pending = True
+    controller.router.dispatch(BANNER)
+    controller.close()
+    assert failures == []
@@ -0,0 +1,86 @@
+import asyncio
+import re
+import time
+from collections import deque
+
+import pytest
+
+from modules.connection import connection_manager
+from modules.core import pattern_manager
+from modules.core.state import state
+
+
+class FakeController(connection_manager.BaseConnection):
+    """A controller that runs every move at once and rejects the move sent as line `reject`."""
+    def __init__(self, reject=None):
+        self.reject = reject
+        self.responses = deque()
+        self.lines = 0
+        self.absolute = True
+        self.held = False
+        self.x = self.y = 0.0
+        self.configure_streaming('character_counting')
+
+    def send(self, data):
+        if data == '?':
+            status = 'Hold:0' if self.held else 'Idle'
+            self.responses.append(f"<{status}|MPos:{self.x:.3f},{self.y:.3f},0.000|Bf:15,128|FS:0,0>")
+            return
+        if data == '!':
+            self.held = True
+            return
+        if data == '\x18':
+            self.held = False
+            self.absolute = True
+            self.responses.append("Grbl 1.1h ['$' for help]")
+            return
+        if len(data) == 1 and not data.strip():
+            return
+        line = data.strip()
+        self.lines += 1
+        if self.lines == self.reject:
+            self.responses.append('error:15')
+            return
+        if 'G91' in line:
+            self.absolute = False
+        if 'G90' in line:
+            self.absolute = True
+        if not line.startswith('$'):
+            axes = dict((k, float(v)) for k, v in re.findall(r'([XY])\s*(-?[\d.]+)', line))
+            if 'X' in axes:
+                self.x = axes['X'] if self.absolute else self.x + axes['X']
+            if 'Y' in axes:
+                self.y = axes['Y'] if self.absolute else self.y + axes['Y']
+        self.responses.append('ok')
+
+    def readline(self):
+        if self.responses:
+            return self.responses.popleft()
+        time.sleep(0.001)
+        return ''
+
+    def in_waiting(self):
+        return len(self.responses)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def run_pattern(controller, path):
+    state.conn = controller
+    state.current_theta = state.current_rho = 0.0
+    state.machine_x = state.machine_y = 0.0
+    asyncio.run(pattern_manager.run_theta_rho_file(path))
+    return controller.x, controller.y
+
+
+def test_rejected_move_does_not_offset_the_rest_of_the_pattern(table):
+    expected = run_pattern(FakeController(), table)
+    # Past the lead-in and G91, well inside the compiled stream
+    controller = FakeController(reject=60)
+    final = run_pattern(controller, table)
+    assert final == pytest.approx(expected, abs=0.01)
+    assert (state.machine_x, state.machine_y) == pytest.approx(final, abs=0.01)
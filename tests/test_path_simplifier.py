@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+from modules.core import kinematics
+from modules.core.path_simplifier import simplify_path
+
+PATTERNS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "patterns")
+
+
+def load_pattern(name):
+    coordinates = []
+    with open(os.path.join(PATTERNS_DIR, name)) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                coordinates.append(tuple(map(float, line.split())))
+    return np.asarray(coordinates).T
+
+
+def max_deviation(xs, ys, kept):
+    """Largest distance of any original point from the simplified polyline segment that replaces it."""
+    worst = 0.0
+    for start, end in zip(kept[:-1], kept[1:]):
+        sx, sy = xs[end] - xs[start], ys[end] - ys[start]
+        px, py = xs[start:end + 1] - xs[start], ys[start:end + 1] - ys[start]
+        length_sq = sx * sx + sy * sy
+        t = np.clip((px * sx + py * sy) / length_sq, 0, 1) if length_sq else np.zeros_like(px)
+        worst = max(worst, float(np.hypot(px - t * sx, py - t * sy).max()))
+    return worst
+
+
+def test_out_and_back_spoke_is_kept():
+    xs = np.array([0.0, 0.0, 0.0, 0.0])
+    ys = np.array([0.0, 10.0, 20.0, 5.0])
+    kept = simplify_path(xs, ys, 0.5)
+    assert 2 in kept
+    assert max_deviation(xs, ys, kept) <= 0.5
+
+
+def test_collinear_points_are_removed():
+    xs = np.linspace(0, 10, 11)
+    ys = np.zeros(11)
+    assert simplify_path(xs, ys, 0.5).tolist() == [0, 10]
+
+
+def test_real_pattern_stays_within_tolerance():
+    thetas, rhos = load_pattern("SpiralGyrations-2.thr")
+    xs, ys = kinematics.compute_machine_coordinates(thetas, rhos, thetas[0], rhos[0], 0.0, 0.0,
+                                                    200, 287.5, 10, "dune_weaver")
+    tolerance = 0.5
+    kept = simplify_path(xs, ys, tolerance)
+    assert len(kept) < len(xs)
+    assert max_deviation(xs, ys, kept) <= tolerance + 1e-9
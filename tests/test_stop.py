@@ -0,0 +1,153 @@
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+
+from modules.connection import connection_manager
+from modules.core import pattern_manager
+from modules.core.state import state
+
+PLANNER_BLOCKS = 15
+
+
+class PlannerController(connection_manager.BaseConnection):
+    """
+    A controller with a 15 block planner that runs one block every `period`
+    seconds. Lines are only acknowledged once they fit in the planner, a feed
+    hold stops at once and a soft reset flushes everything and restores G90.
+    """
+    def __init__(self, period=0.005):
+        self.period = period
+        self.lock = threading.Lock()
+        self.received = deque()
+        self.planner = deque()
+        self.responses = deque()
+        self.absolute = True
+        self.held = False
+        self.resets = 0
+        self.planned = 0
+        # Lines received after a soft reset
+        self.after_reset = []
+        self.x = self.y = 0.0
+        self.next_block = time.monotonic()
+        self.configure_streaming('character_counting')
+
+    def _run_blocks(self):
+        now = time.monotonic()
+        if self.held or not self.planner:
+            self.next_block = now + self.period
+            return
+        while self.planner and now >= self.next_block:
+            self.planner.popleft()
+            self.next_block += self.period
+
+    def _plan(self, line):
+        if 'G91' in line:
+            self.absolute = False
+        if 'G90' in line:
+            self.absolute = True
+        axes = dict((k, float(v)) for k, v in re.findall(r'([XY])\s*(-?[\d.]+)', line))
+        if not axes or line.startswith('$'):
+            return
+        if 'X' in axes:
+            self.x = axes['X'] if self.absolute else self.x + axes['X']
+        if 'Y' in axes:
+            self.y = axes['Y'] if self.absolute else self.y + axes['Y']
+        self.planner.append((self.x, self.y))
+        self.planned += 1
+
+    def send(self, data):
+        with self.lock:
+            self._run_blocks()
+            if data == '?':
+                status = 'Hold:0' if self.held else ('Run' if self.planner else 'Idle')
+                self.responses.append(f"<{status}|MPos:{self.x:.3f},{self.y:.3f},0.000|"
+                                      f"Bf:{PLANNER_BLOCKS - len(self.planner)},128|FS:0,0>")
+            elif data == '!':
+                self.held = True
+            elif data == '~':
+                self.held = False
+            elif data == '\x18':
+                self.received.clear()
+                self.planner.clear()
+                self.held = False
+                self.absolute = True
+                self.resets += 1
+                self.responses.append("Grbl 1.1h ['$' for help]")
+            elif len(data) > 1 or data == '\n':
+                if self.resets:
+                    self.after_reset.append(data.strip())
+                self.received.append(data.strip())
+
+    def readline(self):
+        with self.lock:
+            self._run_blocks()
+            if self.received and len(self.planner) < PLANNER_BLOCKS:
+                self._plan(self.received.popleft())
+                return 'ok'
+            if self.responses:
+                return self.responses.popleft()
+        time.sleep(0.0005)
+        return ''
+
+    def in_waiting(self):
+        return len(self.responses)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def test_stop_sends_no_queued_move_after_the_reset(table):
+    controller = PlannerController()
+    state.conn = controller
+    state.current_theta = state.current_rho = 0.0
+    state.machine_x = state.machine_y = 0.0
+
+    async def play_and_stop():
+        playing = asyncio.create_task(pattern_manager.run_theta_rho_file(table))
+        # Well into the pattern, with the planner and the RX buffer full
+        while controller.planned < 40:
+            await asyncio.sleep(0.005)
+        pattern_manager.stop_actions()
+        await playing
+        await asyncio.sleep(0.3)
+
+    asyncio.run(play_and_stop())
+    assert controller.resets == 1
+    # The banner after the reset was expected, not a controller that reset by itself
+    assert not state.link_interrupted
+    # A stale incremental move would run as an absolute one after the reset
+    assert [line for line in controller.after_reset if re.search(r'[XY]', line)] == []
+
+
+def test_skip_flushes_the_queued_moves(table, tmp_path):
+    # Each move takes 0.2s, running out the planner and RX buffer would take seconds
+    controller = PlannerController(period=0.2)
+    state.conn = controller
+    state.current_theta = state.current_rho = 0.0
+    state.machine_x = state.machine_y = 0.0
+    following = tmp_path / "following.thr"
+    following.write_text(open(table).read())
+
+    async def play_and_skip():
+        playing = asyncio.create_task(pattern_manager.run_theta_rho_files([table, str(following)]))
+        while controller.planned < 20:
+            await asyncio.sleep(0.005)
+        skipped_at = time.monotonic()
+        pattern_manager.skip_pattern()
+        # Until the following pattern is streaming after the reset of the skip
+        while (len([line for line in controller.after_reset if re.search(r'[XY]', line)]) < 5
+               and time.monotonic() - skipped_at < 5):
+            await asyncio.sleep(0.005)
+        started_after = time.monotonic() - skipped_at
+        pattern_manager.stop_actions()
+        await playing
+        return started_after
+
+    started_after = asyncio.run(play_and_skip())
+    assert controller.resets >= 1
+    assert started_after < 1.5